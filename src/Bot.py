@@ -1,20 +1,79 @@
+import asyncio
+import io
+import logging
+from typing import Literal
+
 import discord
 from discord import app_commands, Member, VoiceState, VoiceChannel, HTTPException, RawReactionActionEvent, Guild, \
-    Colour, Message
+    Colour, Message, RawMessageDeleteEvent, RawBulkMessageDeleteEvent, Role, RawReactionClearEvent, \
+    RawReactionClearEmojiEvent
 from discord.app_commands import TransformerError
 from discord.ext import commands
 
 from core.core import setup
 from core.util import approved_role_user, approved_channel_user, get_config, check_config_integrity, \
-    save_config, edit_voice_status, logger
+    save_config, flush_configs, edit_voice_status, reconcile_reactions, logger
 from core.update import __VERSION__, update_routine, check_version
+from core.messages import get_partial_message, fetch_message, forget_message, parse_message_link, message_snippet, \
+    record_snippet
+from core.index import find_reaction_role, search_panels, forget_guild_panels
+from core.state import save_state, load_state
+from core.emojis import check_emote, refresh_guild_emotes, remove_guild_emotes, refresh_all_emotes
+from core.scheduler import scheduler
+from core.dispatch import dispatcher, ROLE, REACTION
+from core.events import events
+from core.watcher import start_config_watcher, stop_config_watcher
+from core.cleanup import remove_guild_data, remove_channel_data, remove_message_data, remove_role_data, \
+    compact_configs
+from core.monitor import watchdog, profiler
+from core.panels import read_panels_file, validate_panels, find_missing_messages, guild_panel_links, export_panels, \
+    apply_panel_reactions
 
 # stores the intents for the bot to use. To make full use of this, some of the intents must be set in the developers
 # portal for discord
 intents = discord.Intents(
-    discord.Intents.voice_states.flag + discord.Intents.reactions.flag + discord.Intents.guilds.flag + discord.Intents.members.flag)
+    discord.Intents.voice_states.flag + discord.Intents.reactions.flag + discord.Intents.guilds.flag + discord.Intents.members.flag
+    + discord.Intents.guild_messages.flag + discord.Intents.emojis_and_stickers.flag)
+
+
+class RoleBot(commands.Bot):
+    async def setup_hook(self):
+        """Called once before connecting, unlike on_ready which is called again on every reconnect"""
+        settings = get_config('settings', False)
+        watchdog.threshold = settings["Loop Lag Threshold"]
+        watchdog.start()
+        dispatcher.start()
+        events.start()
+
+        intervals = settings["Job Intervals"]
+        scheduler.add_job('Update Check', update_routine, self, interval=intervals["Update Check"], delay=5)
+        scheduler.add_job('Config Flush', flush_configs, interval=intervals["Config Flush"])
+        scheduler.add_job('Reaction Reconcile', reconcile_reactions, self, interval=intervals["Reaction Reconcile"],
+                          delay=60, jitter=300)
+        scheduler.add_job('Stats Snapshot', log_stats, interval=intervals["Stats Snapshot"], delay=60, jitter=60)
+        scheduler.add_job('Config Compaction', compact_configs, self,
+                          interval=intervals.get("Config Compaction", 86400), delay=600, jitter=600)
+        load_state()
+        scheduler.start()
+        start_config_watcher(self)
+
+    async def close(self):
+        """Stops all background jobs and saves any pending config changes and the bot's state before disconnecting"""
+        stop_config_watcher()
+        await scheduler.stop()
+        await events.stop()
+        await dispatcher.stop()
+        flush_configs()
+        try:
+            save_state()
+        except OSError as e:
+            logger(f'Could not save the state snapshot: {e}', logging.WARNING, 'state')
+        watchdog.stop()
+        await super().close()
+
+
 # prefix needed before a command is called (obtained from CONFIG.py)
-client = commands.Bot(command_prefix=commands.when_mentioned_or('/'), intents=intents)
+client = RoleBot(command_prefix=commands.when_mentioned_or('/'), intents=intents)
 
 
 ######################################################################################################################
@@ -22,33 +81,57 @@ client = commands.Bot(command_prefix=commands.when_mentioned_or('/'), intents=in
 ######################################################################################################################
 async def reloadrolesmessage(interaction: discord.Interaction, messagelink: str, botonly: bool = True):
     try:
-        config_data = get_config('channels')
+        config_data = get_config('channels', False)
         message = await removeallreactions(interaction, messagelink, botonly)
         for role in config_data['Role Bot'][messagelink]['Roles']:
-            emote = role["Role Emote"] if not isinstance(role['Role Emote'],
-                                                         int) else await interaction.guild.fetch_emoji(
+            emote = role["Role Emote"] if not isinstance(role['Role Emote'], int) else client.get_emoji(
                 role['Role Emote'])
-            await message.add_reaction(emote)
+            await dispatcher.run(REACTION, message.add_reaction, emote)
         return True
     except Exception:
         return False
 
 
 async def removeallreactions(interaction: discord.Interaction, messagelink: str, botonly: bool = True):
-    config_data = get_config('channels')
+    config_data = get_config('channels', False)
     if messagelink not in config_data['Role Bot']:
         await interaction.response.send_message('Message does not appear to be stored', ephemeral=True)
         return
-    channel = await interaction.guild.fetch_channel(int(messagelink.split('/')[-2]))
-    message = await channel.fetch_message(int(messagelink.split('/')[-1]))
+    # clearing all reactions does not require knowing what they are, so the message does not need to be fetched
     if not botonly:
-        await message.clear_reactions()
+        message = await get_partial_message(interaction.guild, messagelink)
+        await dispatcher.run(REACTION, message.clear_reactions)
     else:
-        for reaction in message.reactions:
-            await message.remove_reaction(reaction, client.user)
+        message = await fetch_message(interaction.guild, messagelink)
+        own_reactions = [reaction for reaction in message.reactions if reaction.me]
+        for reaction in own_reactions:
+            await dispatcher.run(REACTION, message.remove_reaction, reaction, client.user)
+        # the cached copy is still accurate if the bot had no reactions to remove
+        if not own_reactions:
+            return message
+    forget_message(message.id)
     return message
 
 
+def log_stats():
+    """Logs a snapshot of the bot's state. Run periodically by the scheduler"""
+    channel_data = get_config('channels', False)
+    logger(f'Stats: {len(client.guilds)} guilds, {len(channel_data["Channels"])} whitelisted channels, '
+           f'{len(channel_data["Role Bot"])} reaction role messages, latency {client.latency * 1000:.0f}ms, '
+           f'loop lag {watchdog.lag * 1000:.0f}ms (max {watchdog.max_lag * 1000:.0f}ms, {watchdog.stalls} stalls)',
+           subsystem='stats')
+    for queue in dispatcher.describe():
+        logger(f'\tQueue "{queue["Name"]}": {queue["Queued"]} queued, {queue["Completed"]} completed, '
+               f'{queue["Shed"]} shed, {queue["Collapsed"]} collapsed, average wait {queue["Average Wait"]:.2f}s',
+               logging.DEBUG, 'stats')
+    for stage in events.describe():
+        logger(f'\tEvents "{stage["Name"]}": {stage["Queued"]} queued, {stage["Handled"]} handled, '
+               f'{stage["Merged"]} merged', logging.DEBUG, 'stats')
+    for job in scheduler.describe():
+        logger(f'\tJob "{job["Name"]}": {job["Runs"]} runs, {job["Failures"]} failures, {job["Skipped"]} skipped, '
+               f'last run {job["Last Run"]} ({job["Last Duration"] or 0:.2f}s)', logging.DEBUG, 'stats')
+
+
 ######################################################################################################################
 # Events
 ######################################################################################################################
@@ -58,29 +141,79 @@ async def on_ready():
     synced = await client.tree.sync()
 
     # check integrity of configs
-    print('Checking integrity of configs...\n - Checking channels.json...', end='')
+    logger('Checking integrity of configs...\n - Checking channels.json...', subsystem='config')
     check_config_integrity('channels')
-    print('Done')
     for guild in client.guilds:
-        print(f' - Checking configs-{guild.id}.json ({guild.name})...', end='')
+        logger(f' - Checking configs-{guild.id}.json ({guild.name})...', subsystem='config')
         check_config_integrity(f'configs-{guild.id}', guild.name)
-        print('Done')
 
-    print(f'Synced {len(synced)} slash commands')
+    # custom emotes the bot can use, for checking emotes without making requests
+    refresh_all_emotes(client)
+
+    logger(f'Synced {len(synced)} slash commands')
     for command in synced:
-        print(f'\t\t/{command}')
+        logger(f'\t\t/{command}')
 
     logger(f' - {client.user.name} is online!')
-    print('-' * 76, "\nSource: https://github.com/KDWallace/DiscordRoleBot/")
-    await client.loop.create_task(update_routine(client))
+    logger('-' * 76 + "\nSource: https://github.com/KDWallace/DiscordRoleBot/")
 
 
 @client.event
 async def on_guild_join(guild: Guild):
     """Function for joining new server. Used to create a new config file"""
-    logger(f'Joined guild: {guild.name}\n - Generating file "configs-{guild.id}.json"...', end='')
+    logger(f'Joined guild: {guild.name}\n - Generating file "configs-{guild.id}.json"...')
     check_config_integrity(f'configs-{guild.id}', guild.name)
-    print('Done')
+    refresh_guild_emotes(guild)
+
+
+@client.event
+async def on_guild_remove(guild: Guild):
+    """Function for leaving a server. Used to remove all data stored for it"""
+    logger(f'Left guild: {guild.name}')
+    remove_guild_data(guild)
+    remove_guild_emotes(guild.id)
+    forget_guild_panels(guild.id)
+
+
+@client.event
+async def on_guild_emojis_update(guild: Guild, before, after):
+    """Function called on a server's custom emotes changing"""
+    refresh_guild_emotes(guild, after)
+
+
+@client.event
+async def on_guild_channel_delete(channel: discord.abc.GuildChannel):
+    """Function called on a channel being deleted"""
+    remove_channel_data(channel.id)
+
+
+@client.event
+async def on_guild_channel_update(before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
+    """Function called on a channel being edited. Messages are searched for by channel name, so a rename means
+    the search keys need rebuilding"""
+    if before.name != after.name:
+        forget_guild_panels(after.guild.id)
+
+
+@client.event
+async def on_guild_role_delete(role: Role):
+    """Function called on a role being deleted"""
+    remove_role_data(role)
+
+
+@client.event
+async def on_raw_message_delete(payload: RawMessageDeleteEvent):
+    """Function called on a message being deleted"""
+    forget_message(payload.message_id)
+    remove_message_data({payload.message_id})
+
+
+@client.event
+async def on_raw_bulk_message_delete(payload: RawBulkMessageDeleteEvent):
+    """Function called on many messages being deleted at once"""
+    for message_id in payload.message_ids:
+        forget_message(message_id)
+    remove_message_data(payload.message_ids)
 
 
 # checks user messages
@@ -100,49 +233,53 @@ async def on_message(ctx: Message):
 async def on_member_update(before: Member, after: Member):
     """Function called on member update, used to detect role update"""
     if before.roles != after.roles and after.voice and after.voice.channel:
-        await edit_voice_status(after.voice.channel)
+        events.submit('Member Update', after.voice.channel)
 
 
 @client.event
 async def on_raw_reaction_add(payload: RawReactionActionEvent):
     """Function called on user reacting to a message"""
-    role_data = get_config('channels')
+    # cached messages are only used for the bot's own reactions, so other users reacting does not make them outdated
+    if payload.user_id == client.user.id:
+        forget_message(payload.message_id)
     messagelink = f"https://discord.com/channels/{payload.guild_id}/{payload.channel_id}/{payload.message_id}"
-    if "Role Bot" in role_data and messagelink in role_data["Role Bot"]:
-        emoji = str(payload.emoji)  # payload.emoji.id if payload.emoji.is_custom_emoji() else str(payload.emoji)
-        for role in role_data["Role Bot"][messagelink]["Roles"]:
-            # added or statement for backward compatibility
-            if role["Role Emote"] == emoji or (
-                    payload.emoji.is_custom_emoji() and payload.emoji.id == role["Role Emote"]):
-                user = payload.member
-                guild = await client.fetch_guild(payload.guild_id)
-                for guild_role in guild.roles:
-                    if guild_role.id == role["Role ID"]:
-                        if guild_role not in user.roles:
-                            await user.add_roles(guild_role)
-                        break
-                break
+    role_id = find_reaction_role(messagelink, payload.emoji)
+    if role_id is None:
+        return
+    # the role is taken from the cache rather than requesting the guild
+    user = payload.member
+    guild_role = client.get_guild(payload.guild_id).get_role(role_id)
+    if guild_role and guild_role not in user.roles:
+        await dispatcher.run(ROLE, user.add_roles, guild_role)
+
+
+@client.event
+async def on_raw_reaction_clear(payload: RawReactionClearEvent):
+    """Function called on all reactions being removed from a message"""
+    forget_message(payload.message_id)
+
+
+@client.event
+async def on_raw_reaction_clear_emoji(payload: RawReactionClearEmojiEvent):
+    """Function called on all reactions of one emoji being removed from a message"""
+    forget_message(payload.message_id)
 
 
 @client.event
 async def on_raw_reaction_remove(payload: RawReactionActionEvent):
     """Function called on user removing a reaction from a message"""
-    role_data = get_config('channels')
+    # cached messages are only used for the bot's own reactions, so other users reacting does not make them outdated
+    if payload.user_id == client.user.id:
+        forget_message(payload.message_id)
     messagelink = f"https://discord.com/channels/{payload.guild_id}/{payload.channel_id}/{payload.message_id}"
-    if "Role Bot" in role_data and messagelink in role_data["Role Bot"]:
-        emoji = str(payload.emoji)  # payload.emoji.id if payload.emoji.is_custom_emoji() else str(payload.emoji)
-        for role in role_data["Role Bot"][messagelink]["Roles"]:
-            # added or statement for backward compatibility
-            if role["Role Emote"] == emoji or (
-                    payload.emoji.is_custom_emoji() and payload.emoji.id == role["Role Emote"]):
-                guild = await client.fetch_guild(payload.guild_id)
-                user = await guild.fetch_member(payload.user_id)
-                for guild_role in guild.roles:
-                    if guild_role.id == role["Role ID"]:
-                        if guild_role in user.roles:
-                            await user.remove_roles(guild_role)
-                        break
-                break
+    role_id = find_reaction_role(messagelink, payload.emoji)
+    if role_id is None:
+        return
+    guild = client.get_guild(payload.guild_id)
+    user = guild.get_member(payload.user_id) or await guild.fetch_member(payload.user_id)
+    guild_role = guild.get_role(role_id)
+    if guild_role and guild_role in user.roles:
+        await dispatcher.run(ROLE, user.remove_roles, guild_role)
 
 
 @client.event
@@ -152,7 +289,42 @@ async def on_voice_state_update(member: Member, before: VoiceState, after: Voice
     if before.channel != after.channel:
         for channel in (before.channel, after.channel):
             if channel:
-                await edit_voice_status(channel)
+                events.submit('Voice State', channel)
+
+
+######################################################################################################################
+# Autocomplete
+# Called on every keystroke and must answer quickly, so only data already in memory is used
+######################################################################################################################
+async def messagelink_autocomplete(interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+    """Suggests the guild's reaction role messages, found by channel name, message id or link"""
+    role_bot = get_config('channels', False)["Role Bot"]
+    choices = []
+    for messagelink in search_panels(interaction.guild, current):
+        _, channel_id, message_id = parse_message_link(messagelink)
+        channel = interaction.guild.get_channel_or_thread(channel_id)
+        snippet = message_snippet(messagelink) or f'message {message_id}'
+        name = f'#{channel.name if channel else "unknown channel"} - {snippet} - ' \
+               f'{len(role_bot[messagelink]["Roles"])} roles'
+        choices.append(app_commands.Choice(name=name[:100], value=messagelink))
+    return choices
+
+
+async def panel_role_autocomplete(interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+    """Suggests the roles on the message given in the messagelink option, found by name or id"""
+    messagelink = interaction.namespace.messagelink
+    if not messagelink:
+        return []
+    message_data = get_config('channels', False)["Role Bot"].get(messagelink.strip())
+    if not message_data:
+        return []
+    current = current.strip().lower()
+    choices = []
+    for stored_role in message_data["Roles"]:
+        role = interaction.guild.get_role(stored_role["Role ID"])
+        if role and (role.name.lower().startswith(current) or str(role.id).startswith(current)):
+            choices.append(app_commands.Choice(name=f'@{role.name}'[:100], value=str(role.id)))
+    return choices[:25]
 
 
 ######################################################################################################################
@@ -186,7 +358,7 @@ async def addchannel(interaction: discord.Interaction, channel: VoiceChannel):
 async def removechannel(interaction: discord.Interaction, channel: VoiceChannel):
     if channel in interaction.guild.channels:
         config_channels = get_config('channels')
-        icon = get_config(f'configs-{interaction.guild_id}')["Active Icon"]
+        icon = get_config(f'configs-{interaction.guild_id}', False)["Active Icon"]
 
         # if the channel is already whitelisted
         if channel.id not in config_channels["Channels"].values():
@@ -216,6 +388,7 @@ async def removechannel_error(interaction: discord.Interaction, error: app_comma
                        emote="The emote you wish to use as the reaction (make sure it's one the bot has too)",
                        messagelink="The link to the message you wish to use (right click and Copy Message Link)"
                        )
+@app_commands.autocomplete(messagelink=messagelink_autocomplete)
 async def addrole(interaction: discord.Interaction,
                   role: discord.Role,
                   emote: str,
@@ -226,11 +399,15 @@ async def addrole(interaction: discord.Interaction,
                                                 ephemeral=True)
         return
 
-    # extract channel and message ids as ints from the link
-    channelid, messageid = [int(x) for x in messagelink.split('/')[-2:]]
+    # invalid emotes are caught here rather than by discord rejecting the reaction
+    emote_error = check_emote(emote)
+    if emote_error:
+        await interaction.response.send_message(emote_error, ephemeral=True)
+        return
 
-    channel = await interaction.guild.fetch_channel(channelid)
-    message = await channel.fetch_message(messageid)
+    # only reactions are changed, so a partial message avoids fetching the message itself
+    message = await get_partial_message(interaction.guild, messagelink)
+    forget_message(message.id)
 
     # if the emote is a custom emote, get it
     # if '<' in emote:
@@ -266,8 +443,8 @@ async def addrole(interaction: discord.Interaction,
                         await interaction.response.send_message(
                             f'The role icon for {role.mention} has been replaced from {old_emote} to {emote}'
                             f'\n{messagelink}', ephemeral=True)
-                        await message.remove_reaction(old_emote, client.user)
-                        await message.add_reaction(emote)
+                        await dispatcher.run(REACTION, message.remove_reaction, old_emote, client.user)
+                        await dispatcher.run(REACTION, message.add_reaction, emote)
                         role_config["Role Bot"][messagelink]["Roles"] = [
                             *role_config["Role Bot"][messagelink]["Roles"][:r_pos],
                             *role_config["Role Bot"][messagelink]["Roles"][r_pos + 1:],
@@ -288,7 +465,7 @@ async def addrole(interaction: discord.Interaction,
                     return
 
             # if it doesn't exist already, then let's make it exist
-            await message.add_reaction(emote)
+            await dispatcher.run(REACTION, message.add_reaction, emote)
             await interaction.response.send_message(f'The role {role.mention} has added and given the emote: {emote}'
                                                     f'\n{messagelink}', ephemeral=True)
             if 'Roles' in role_config["Role Bot"][messagelink] and isinstance(
@@ -309,13 +486,14 @@ async def addrole(interaction: discord.Interaction,
             "Roles": [{"Role Name": role.name, "Role ID": role.id, "Role Emote": emote_id}]
         }
         role_config["Role Bot"][messagelink] = role_data
-        await message.add_reaction(emote)
+        await dispatcher.run(REACTION, message.add_reaction, emote)
         save_config('channels', role_config)
 
         # the bot will then react to the message
         await interaction.response.send_message(
             f'The reaction message has been stored and the role {role.mention} can be obtained by reacting with {emote}'
             f'\n{messagelink}', ephemeral=True)
+        await record_snippet(interaction.guild, messagelink)
 
 
 @addrole.error
@@ -330,18 +508,24 @@ async def addrole_error(interaction: discord.Interaction, error: app_commands.er
 
 @app_commands.check(approved_role_user)
 @client.tree.command(name="removerole", description='Remove a role from the roles message.')
-@app_commands.describe(role="@role you wish to remove",
+@app_commands.describe(role="The role you wish to remove (choose from the suggestions or @mention it)",
                        messagelink="The link to the message you wish to use (right click and Copy Message Link)"
                        )
+@app_commands.autocomplete(role=panel_role_autocomplete, messagelink=messagelink_autocomplete)
 async def removerole(interaction: discord.Interaction,
-                     role: discord.Role,
+                     role: str,
                      messagelink: str
                      ):
-    # extract channel and message ids as ints from the link
-    channelid, messageid = [int(x) for x in messagelink.split('/')[-2:]]
+    # the role is given as its id (from autocomplete) or as a mention, so that it can be suggested from the message
+    role_id = role.strip().removeprefix('<@&').removesuffix('>')
+    role = interaction.guild.get_role(int(role_id)) if role_id.isdigit() else None
+    if role is None:
+        await interaction.response.send_message('That is not a role in this server', ephemeral=True)
+        return
 
-    channel = await interaction.guild.fetch_channel(channelid)
-    message = await channel.fetch_message(messageid)
+    # only reactions are changed, so a partial message avoids fetching the message itself
+    message = await get_partial_message(interaction.guild, messagelink)
+    forget_message(message.id)
 
     # gets config info, will need everything even though we're only changing Role Bot
     role_config = get_config('channels')
@@ -368,7 +552,7 @@ async def removerole(interaction: discord.Interaction,
                     await interaction.response.send_message(
                         f'The role icon for {role.mention} with emote {emote} has been removed from the message'
                         f'\n{messagelink}', ephemeral=True)
-                    await message.remove_reaction(emote, client.user)
+                    await dispatcher.run(REACTION, message.remove_reaction, emote, client.user)
                     del role_config["Role Bot"][messagelink]["Roles"][r_pos]
                     if not role_config["Role Bot"][messagelink]["Roles"]:
                         del role_config["Role Bot"][messagelink]
@@ -411,22 +595,24 @@ async def bulkaddroles(interaction: discord.Interaction,
         await interaction.response.send_message(f'{len(roles)} roles but {len(emotes)} emotes detected.\n'
                                                 f'Ensure emotes are separated via spaces and try again', ephemeral=True)
         return
-    await interaction.response.defer()
-    message = {'Roles': []}
 
-    all_roles = await interaction.guild.fetch_roles()
-    all_role_ids = [r.id for r in all_roles]
-    all_role_names = [r.name for r in all_roles]
+    # everything is checked against the cache before any requests are made
+    emote_errors = [error for error in map(check_emote, emotes) if error]
+    if emote_errors:
+        await interaction.response.send_message('\n'.join(emote_errors), ephemeral=True)
+        return
+    message = {'Roles': []}
 
     pairings = ''
     for i, role in enumerate(roles):
-        if role not in all_role_ids:
-            await interaction.followup.send(f'Role: <@&{role}> not found', ephemeral=True)
+        guild_role = interaction.guild.get_role(role)
+        if guild_role is None:
+            await interaction.response.send_message(f'Role: <@&{role}> not found', ephemeral=True)
             return
         else:
-            index = all_role_ids.index(role)
-            message['Roles'].append({"Role Name": all_role_names[index], "Role ID": role, "Role Emote": emotes[i]})
+            message['Roles'].append({"Role Name": guild_role.name, "Role ID": role, "Role Emote": emotes[i]})
             pairings += f'- {emotes[i]} <@&{role}>\n'
+    await interaction.response.defer()
 
     config_data = get_config('channels')
     config_data['Role Bot'][messagelink] = message
@@ -434,6 +620,7 @@ async def bulkaddroles(interaction: discord.Interaction,
     if await reloadrolesmessage(interaction, messagelink, False):
         await interaction.followup.send(f'{messagelink} has had the following roles added to it:\n{pairings}',
                                         ephemeral=True)
+        await record_snippet(interaction.guild, messagelink)
         return
 
     save_config('channels', old_config_data)
@@ -442,11 +629,82 @@ async def bulkaddroles(interaction: discord.Interaction,
                                     ephemeral=True)
 
 
+@app_commands.check(approved_role_user)
+@client.tree.command(name="importroles", description='Add roles to many messages at once from a json or csv file.')
+@app_commands.describe(file="A file made by /exportroles, or a csv with the columns: messagelink, role, emote",
+                       replace="Remove stored roles for messages in this server that are not in the file")
+async def importroles(interaction: discord.Interaction, file: discord.Attachment, replace: bool = False):
+    if file.size > 1024 * 1024:
+        await interaction.response.send_message('The file is too large (1MB maximum)', ephemeral=True)
+        return
+    await interaction.response.defer(ephemeral=True)
+
+    try:
+        panels = read_panels_file(file.filename, await file.read())
+    except ValueError as e:
+        await interaction.followup.send(f'Could not read {file.filename}: {e}', ephemeral=True)
+        return
+
+    # everything is checked before any changes are made
+    role_bot, errors = validate_panels(interaction.guild, panels)
+    # messages are only fetched once everything else is valid
+    if not errors:
+        errors = await find_missing_messages(interaction.guild, role_bot)
+    if errors:
+        message = f'# Nothing was imported\n{len(errors)} problems were found:\n'
+        report = '\n'.join(f'- {error}' for error in errors)
+        # long reports do not fit in a message, so the full list is attached instead
+        if len(message + report) > 2000:
+            await interaction.followup.send(message + 'See the attached file for the full list', ephemeral=True,
+                                            file=discord.File(io.BytesIO(report.encode('utf-8')),
+                                                              filename='import-errors.txt'))
+        else:
+            await interaction.followup.send(message + report, ephemeral=True)
+        return
+    if not role_bot:
+        await interaction.followup.send(f'{file.filename} does not contain any roles, so nothing was imported',
+                                        ephemeral=True)
+        return
+
+    # all messages are stored in a single save
+    config_data = get_config('channels')
+    removed = {}
+    if replace:
+        for messagelink in guild_panel_links(interaction.guild_id, config_data['Role Bot']):
+            if messagelink not in role_bot:
+                del config_data['Role Bot'][messagelink]
+                # with no roles stored, all of the bot's reactions are removed from the message
+                removed[messagelink] = {"Roles": []}
+    config_data['Role Bot'].update(role_bot)
+    save_config('channels', config_data)
+
+    summary = await apply_panel_reactions(client, interaction.guild, role_bot | removed)
+    message = (f'# Import complete\n'
+               f'- Messages: `{len(role_bot)}`\n'
+               f'- Messages removed: `{len(removed)}`\n'
+               f'- Roles: `{sum(len(data["Roles"]) for data in role_bot.values())}`\n'
+               f'- Reactions added: `{summary["Added"]}` removed: `{summary["Removed"]}`\n')
+    if summary["Failed"]:
+        message += f'## Reactions could not be updated on {len(summary["Failed"])} messages:\n'
+        message += '\n'.join(f'- {failure}' for failure in summary["Failed"][:10])
+    await interaction.followup.send(message[:2000], ephemeral=True)
+
+
+@app_commands.check(approved_role_user)
+@client.tree.command(name="exportroles", description='Download all reaction role messages in this server as a file.')
+@app_commands.describe(file_format="The format of the file (Default = json)")
+async def exportroles(interaction: discord.Interaction, file_format: Literal['json', 'csv'] = 'json'):
+    data = export_panels(interaction.guild_id, get_config('channels', False)['Role Bot'], file_format)
+    await interaction.response.send_message(
+        file=discord.File(io.BytesIO(data), filename=f'roles-{interaction.guild_id}.{file_format}'), ephemeral=True)
+
+
 @client.tree.command(name="getroles", description='Shows roles associated with a message.')
 @app_commands.describe(messagelink="The link to the message you wish to inspect (right click and Copy Message Link)")
+@app_commands.autocomplete(messagelink=messagelink_autocomplete)
 async def getroles(interaction: discord.Interaction,
                    messagelink: str):
-    config_data = get_config('channels')
+    config_data = get_config('channels', False)
     if messagelink not in config_data['Role Bot'] or not config_data['Role Bot'][messagelink]:
         await interaction.response.send_message('There does not appear to be any data associated with this message',
                                                 ephemeral=True)
@@ -494,15 +752,84 @@ async def generateroles(interaction: discord.Interaction, roles: str, colour: st
 @app_commands.check(approved_role_user)
 @client.tree.command(name="checkupdate", description='Compare the bot to the latest version available.')
 async def checkupdate(interaction: discord.Interaction):
-    git_version = check_version()
+    await interaction.response.defer(ephemeral=True)
+    # the check makes blocking web requests, so it is run outside the event loop
+    git_version = await asyncio.to_thread(check_version)
     if git_version != __VERSION__:
-        await interaction.response.send_message(f'# Update Found\n'
-                                                f'Current version: `{__VERSION__}`\n'
-                                                f'Version available: `{git_version}`\n'
-                                                f'The latest version has been downloaded.\n'
-                                                f'Please install the latest instance available', ephemeral=True)
+        await interaction.followup.send(f'# Update Found\n'
+                                        f'Current version: `{__VERSION__}`\n'
+                                        f'Version available: `{git_version}`\n'
+                                        f'The latest version has been downloaded.\n'
+                                        f'Please install the latest instance available', ephemeral=True)
     else:
-        await interaction.response.send_message(f'Current version: `{__VERSION__}` is up to date', ephemeral=True)
+        await interaction.followup.send(f'Current version: `{__VERSION__}` is up to date', ephemeral=True)
+
+
+@app_commands.check(approved_role_user)
+@client.tree.command(name="compactconfigs", description='Remove stored data for deleted channels, roles and messages.')
+async def compactconfigs(interaction: discord.Interaction):
+    await interaction.response.defer(ephemeral=True)
+    report = await compact_configs(client)
+    await interaction.followup.send(f'# Compaction complete\n'
+                                    f'- Channels removed: `{report["Channels"]}`\n'
+                                    f'- Messages removed: `{report["Messages"]}`\n'
+                                    f'- Roles removed: `{report["Roles"]}`\n'
+                                    f'- Config files removed: `{report["Files"]}`\n'
+                                    f'- Space reclaimed: `{report["Bytes"]}` bytes', ephemeral=True)
+
+
+@app_commands.checks.has_permissions(administrator=True)
+@client.tree.command(name="profile", description='Profile the bot for a number of seconds and show the slowest code.')
+@app_commands.describe(seconds="How long to profile for (Default = 30)")
+async def profile(interaction: discord.Interaction, seconds: app_commands.Range[int, 1, 300] = 30):
+    if profiler.running:
+        await interaction.response.send_message('A profile is already running', ephemeral=True)
+        return
+    await interaction.response.defer(ephemeral=True)
+    report = await profiler.profile(seconds)
+    await interaction.followup.send(f'# Profile complete\n'
+                                    f'- Duration: `{seconds}s`\n'
+                                    f'- Loop lag: `{watchdog.lag * 1000:.0f}ms` '
+                                    f'(max `{watchdog.max_lag * 1000:.0f}ms`)\n'
+                                    f'- Times the loop was blocked: `{watchdog.stalls}`',
+                                    file=discord.File(io.BytesIO(report.encode('utf-8')), filename='profile.txt'),
+                                    ephemeral=True)
+
+
+@app_commands.check(approved_role_user)
+@client.tree.command(name="queues", description='Shows the bot\'s queued requests to discord and queued events.')
+async def queues(interaction: discord.Interaction):
+    message = '# Request Queues\n'
+    for queue in dispatcher.describe():
+        message += (f'- **{queue["Name"]}**\n'
+                    f'  Queued: `{queue["Queued"]}` Running: `{queue["Running"]}` '
+                    f'Oldest: `{queue["Oldest Wait"]:.2f}s`\n'
+                    f'  Completed: `{queue["Completed"]}` Failed: `{queue["Failed"]}` '
+                    f'Shed: `{queue["Shed"]}` Collapsed: `{queue["Collapsed"]}`\n'
+                    f'  Wait: `{queue["Average Wait"]:.2f}s` average, `{queue["Max Wait"]:.2f}s` max\n')
+    message += '# Event Queues\n'
+    for stage in events.describe():
+        message += (f'- **{stage["Name"]}**\n'
+                    f'  Queued: `{stage["Queued"]}` Received: `{stage["Received"]}` Handled: `{stage["Handled"]}` '
+                    f'Failed: `{stage["Failed"]}`\n'
+                    f'  Merged: `{stage["Merged"]}`\n')
+    await interaction.response.send_message(message, ephemeral=True)
+
+
+@app_commands.check(approved_role_user)
+@client.tree.command(name="jobs", description='Shows the state of the bot\'s background jobs.')
+async def jobs(interaction: discord.Interaction):
+    message = '# Background Jobs\n'
+    for job in scheduler.describe():
+        message += f'- **{job["Name"]}**'
+        if job["Running"]:
+            message += ' (running)'
+        if job["Last Run"]:
+            message += f'\n  Last run: `{job["Last Run"]}` taking `{job["Last Duration"]:.2f}s`'
+        else:
+            message += '\n  Not yet run'
+        message += f'\n  Runs: `{job["Runs"]}` Failures: `{job["Failures"]}` Skipped: `{job["Skipped"]}`\n'
+    await interaction.response.send_message(message, ephemeral=True)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,195 @@
+#### Module for removing stored data about messages, roles, channels and guilds that no longer exist
+import asyncio
+import os
+
+import discord
+from discord import Guild
+
+import core.core as core
+from core.messages import parse_message_link
+from core.util import logger, get_config, save_config, delete_config, config_size
+
+# number of entries checked before giving other tasks a chance to run during compaction
+BATCH_SIZE = 200
+# seconds waited after requesting a channel that is not in the cache during compaction
+FETCH_DELAY = 1
+
+
+def remove_guild_data(guild: Guild):
+    """Removes everything stored for a guild the bot has left, including its configs-<guild>.json file"""
+    channel_ids = {channel.id for channel in guild.channels}
+    config_data = get_config('channels')
+    removed = _remove_channels(config_data, channel_ids)
+    removed += _remove_panels(config_data, lambda guild_id, channel_id, message_id: guild_id == guild.id)
+    if removed:
+        save_config('channels', config_data)
+    delete_config(f'configs-{guild.id}')
+    logger(f'Removed data for guild {guild.name} ({guild.id}): {removed} entries and its config file',
+           subsystem='config')
+
+
+def remove_channel_data(channel_id: int):
+    """Removes a deleted channel from the whitelist along with any reaction role messages in it"""
+    config_data = get_config('channels')
+    removed = _remove_channels(config_data, {channel_id})
+    removed += _remove_panels(config_data,
+                              lambda guild_id, panel_channel_id, message_id: panel_channel_id == channel_id)
+    if removed:
+        save_config('channels', config_data)
+        logger(f'Removed {removed} entries for deleted channel {channel_id}', subsystem='config')
+
+
+def remove_message_data(message_ids: set[int]):
+    """Removes deleted messages from the stored reaction role messages"""
+    # called for every deleted message the bot can see, so a cheap check is made before copying the config
+    message_ids = {str(message_id) for message_id in message_ids}
+    role_bot = get_config('channels', False)['Role Bot']
+    if not any(messagelink.rsplit('/', 1)[-1] in message_ids for messagelink in role_bot):
+        return
+    config_data = get_config('channels')
+    removed = _remove_panels(config_data, lambda guild_id, channel_id, message_id: str(message_id) in message_ids)
+    save_config('channels', config_data)
+    logger(f'Removed {removed} deleted reaction role messages', subsystem='config')
+
+
+def remove_role_data(role: discord.Role):
+    """Removes a deleted role from reaction role messages and from the role lists in the guild's config"""
+    config_data = get_config('channels')
+    removed = 0
+    for messagelink in list(config_data['Role Bot']):
+        if _panel_ids(messagelink)[0] != role.guild.id:
+            continue
+        roles = config_data['Role Bot'][messagelink]['Roles']
+        kept = [r for r in roles if r['Role ID'] != role.id]
+        if len(kept) != len(roles):
+            removed += len(roles) - len(kept)
+            if kept:
+                config_data['Role Bot'][messagelink]['Roles'] = kept
+            else:
+                del config_data['Role Bot'][messagelink]
+    if removed:
+        save_config('channels', config_data)
+
+    filename = f'configs-{role.guild.id}'
+    guild_config = get_config(filename)
+    for entry in ('Role Manager Roles', 'Channel Manager Roles'):
+        if role.id in guild_config.get(entry, []):
+            guild_config[entry].remove(role.id)
+            removed += 1
+            save_config(filename, guild_config)
+
+    if removed:
+        logger(f'Removed {removed} entries for deleted role {role.name} ({role.id})', subsystem='config')
+
+
+async def compact_configs(client: discord.Client) -> dict:
+    """Checks every stored id against the bot's cache and removes anything that no longer exists.
+    Returns a report of the entries removed and the bytes reclaimed"""
+    report = {"Channels": 0, "Messages": 0, "Roles": 0, "Files": 0, "Bytes": 0}
+    # with an incomplete cache, things that still exist would look deleted
+    if not client.is_ready():
+        return report
+
+    # ids are checked against a snapshot, yielding between batches. The removals are then made in one go so that no
+    # other changes made in the meantime are lost
+    snapshot = get_config('channels', False)
+    # whitelisted channels are not stored by guild, so any outage means a missing channel may only be temporary
+    guild_outage = any(guild.unavailable for guild in client.guilds)
+
+    dead_channels = set()
+    for checked, channel_id in enumerate(list(snapshot['Channels'].values()), 1):
+        if client.get_channel(channel_id) is None and not guild_outage:
+            dead_channels.add(channel_id)
+        if checked % BATCH_SIZE == 0:
+            await asyncio.sleep(0)
+
+    dead_messages = set()
+    dead_roles = set()
+    # channel id -> whether it exists, for channels that had to be requested
+    fetched_channels: dict[int, bool] = {}
+    for checked, (messagelink, message_data) in enumerate(list(snapshot['Role Bot'].items()), 1):
+        if checked % BATCH_SIZE == 0:
+            await asyncio.sleep(0)
+        guild_id, channel_id, _ = _panel_ids(messagelink)
+        guild = client.get_guild(guild_id)
+        if guild is not None and guild.unavailable:
+            continue
+        if guild is None:
+            dead_messages.add(messagelink)
+            continue
+        # archived threads and forum posts are never in the cache, so a missing channel is requested to be sure
+        if guild.get_channel_or_thread(channel_id) is None:
+            if channel_id not in fetched_channels:
+                fetched_channels[channel_id] = await _channel_exists(guild, channel_id)
+                await asyncio.sleep(FETCH_DELAY)
+            if not fetched_channels[channel_id]:
+                dead_messages.add(messagelink)
+                continue
+        dead_roles.update(role['Role ID'] for role in message_data['Roles'] if guild.get_role(role['Role ID']) is None)
+
+    if dead_channels or dead_messages or dead_roles:
+        size_before = config_size('channels')
+        config_data = get_config('channels')
+        report["Channels"] = _remove_channels(config_data, dead_channels)
+        for messagelink in list(config_data['Role Bot']):
+            roles = config_data['Role Bot'][messagelink]['Roles']
+            kept = [role for role in roles if role['Role ID'] not in dead_roles]
+            report["Roles"] += len(roles) - len(kept)
+            if messagelink in dead_messages or not kept:
+                del config_data['Role Bot'][messagelink]
+                report["Messages"] += 1
+            elif len(kept) != len(roles):
+                config_data['Role Bot'][messagelink]['Roles'] = kept
+        save_config('channels', config_data)
+        report["Bytes"] += size_before - config_size('channels')
+
+    # config files for guilds the bot is no longer in
+    guild_ids = {guild.id for guild in client.guilds}
+    for file in os.listdir(f'{core.PATH}/config'):
+        if file.startswith('configs-') and file.endswith('.json'):
+            guild_id = file[len('configs-'):-len('.json')]
+            if guild_id.isdigit() and int(guild_id) not in guild_ids:
+                report["Bytes"] += delete_config(file[:-len('.json')])
+                report["Files"] += 1
+
+    if any(report.values()):
+        logger(f'Config compaction removed {report["Channels"]} channels, {report["Messages"]} messages, '
+               f'{report["Roles"]} roles and {report["Files"]} files, reclaiming {report["Bytes"]} bytes',
+               subsystem='config')
+    return report
+
+
+async def _channel_exists(guild: Guild, channel_id: int) -> bool:
+    """Requests a channel that is not in the cache. Only a channel discord reports as not found counts as deleted"""
+    try:
+        await guild.fetch_channel(channel_id)
+    except discord.NotFound:
+        return False
+    except discord.HTTPException:
+        pass
+    return True
+
+
+def _panel_ids(messagelink: str) -> tuple[int, int, int]:
+    """Returns the ids in a stored message link, or zeros if the link is not valid"""
+    try:
+        return parse_message_link(messagelink)
+    except ValueError:
+        return 0, 0, 0
+
+
+def _remove_channels(config_data: dict, channel_ids: set[int]) -> int:
+    """Removes channels from the whitelist. Returns the number removed"""
+    names = [name for name, channel_id in config_data['Channels'].items() if channel_id in channel_ids]
+    for name in names:
+        del config_data['Channels'][name]
+    return len(names)
+
+
+def _remove_panels(config_data: dict, check) -> int:
+    """Removes reaction role messages where check(guild_id, channel_id, message_id) is true. Returns the number
+    removed"""
+    links = [messagelink for messagelink in config_data['Role Bot'] if check(*_panel_ids(messagelink))]
+    for messagelink in links:
+        del config_data['Role Bot'][messagelink]
+    return len(links)
@@ -1,10 +1,12 @@
 #### Module for setup of bot
+import logging
 import os
 import sys
 from datetime import datetime
 
+from core.log import start_logging, stop_logging
 from core.update import __VERSION__
-from core.util import logger
+from core.util import logger, check_config_integrity
 
 # Main path for DIR navigation for files/config
 PATH = (os.path.dirname(os.path.realpath(__file__)))[:-8]
@@ -12,7 +14,7 @@ PATH = (os.path.dirname(os.path.realpath(__file__)))[:-8]
 
 def setup(client):
     # checks for all required dirs
-    check_dir('config')
+    check_dir('config', 'logs')
 
     if len(sys.argv) > 1:
         # if so, use the arguments as the name and version
@@ -31,8 +33,11 @@ def setup(client):
     print(('=' * length) + f' {version} ' + ('=' * length) + f'\n   - Booted at {datetime.now().strftime("%H:%M:%S")}\n'
                                                              f'   - Please wait...')
 
+    # anything logged before this point is written once logging has started
+    start_logging(check_config_integrity('settings'), f'{PATH}/logs')
+
     # get bot token
-    logger('        Obtaining token from textfile...', end='')
+    logger('        Obtaining token from textfile...', subsystem='core')
     try:
         # opens file containing bot token
         with open(f'{PATH}/src/TOKEN.txt', 'r') as f:
@@ -40,10 +45,10 @@ def setup(client):
 
         # if there is a string in the file, assume found
         if len(TOKEN) > 1:
-            print('Token found')
+            logger('        Token found', subsystem='core')
 
-            # attempt to run with this token
-            client.run(TOKEN)
+            # attempt to run with this token. discord.py logs through the bot's own logging rather than its default
+            client.run(TOKEN, log_handler=None)
 
         # if file does not contain token, raise exception
         else:
@@ -51,29 +56,34 @@ def setup(client):
 
     # exception thrown if token does not exist or is not valid
     except FileNotFoundError:
-        print('\n[ERROR]:  Token not found. Please paste your bot token in the TOKEN.txt file')
+        logger('Token not found. Please paste your bot token in the TOKEN.txt file', logging.ERROR, 'core')
 
     # exception related to bot
     except Exception as e:
-        print(e)
+        logger(str(e), logging.ERROR, 'core')
+
+    finally:
+        stop_logging()
 
 
 def check_dir(*dirs):
     """Function for checking for the existence of necessary directories within the program files.
     Will attempt to generate any that are absent"""
-    logger('Checking for required directories:')
+    logger('Checking for required directories:', subsystem='core')
     for dir_name in dirs:
         if not os.path.isdir(f'{PATH}/{dir_name}'):
-            logger(f'\t - Missing required path: "{PATH}{dir_name}"\nAttempting to create missing path...', end='')
+            logger(f'\t - Missing required path: "{PATH}{dir_name}". Attempting to create missing path...',
+                   logging.WARNING, 'core')
             os.makedirs(f'{PATH}{dir_name}\\')
-            print('path created')
+            logger(f'\t - Path "{PATH}{dir_name}" created', subsystem='core')
         else:
-            logger(f'\t - Path "{PATH}{dir_name}" found')
+            logger(f'\t - Path "{PATH}{dir_name}" found', subsystem='core')
 
 
 # function if the wrong file is run as the main
 def incorrectModuleAsMain():
-    logger('This python file should not be used as the main file. Please run "Bot.py" to use this bot')
+    logger('This python file should not be used as the main file. Please run "Bot.py" to use this bot',
+           logging.WARNING, 'core')
 
 
 if __name__ == '__main__':
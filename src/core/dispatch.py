@@ -0,0 +1,175 @@
+#### Module for ordering the bot's requests to discord by how noticeable they are to users
+# Every request shares the bot's global rate limit. Requests are queued by priority class and run by a fixed number
+# of workers, so that users waiting on a role are served before cosmetic changes such as voice channel statuses.
+# Interaction responses and follow-ups are not subject to the global rate limit, so they are sent directly
+# When busy, queued requests for the same target are combined and the voice status class drops its oldest requests
+import asyncio
+import time
+from collections import deque
+
+# priority classes, from most to least important
+ROLE = 0
+REACTION = 1
+VOICE_STATUS = 2
+PRIORITY_NAMES = ('Role', 'Reaction', 'Voice Status')
+
+# number of requests run at once
+WORKERS = 4
+# maximum requests of each class run at once. Slow or rate limited requests in the low classes can then never take
+# every worker
+CLASS_CONCURRENCY = (WORKERS, 2, 1)
+# maximum queued requests of each class, beyond which the oldest are dropped. None never drops requests. Only cosmetic
+# requests are dropped, as callers of the other classes report their requests as done
+CLASS_LIMITS = (None, None, 200)
+
+
+class _Request:
+    __slots__ = ('priority', 'func', 'args', 'key', 'future', 'queued')
+
+    def __init__(self, priority: int, func, args: tuple, key):
+        self.priority = priority
+        self.func = func
+        self.args = args
+        self.key = key
+        self.future = asyncio.get_running_loop().create_future()
+        self.queued = time.monotonic()
+
+
+class _ClassStats:
+    __slots__ = ('completed', 'failed', 'shed', 'collapsed', 'running', 'total_wait', 'max_wait')
+
+    def __init__(self):
+        self.completed = 0
+        self.failed = 0
+        self.shed = 0
+        self.collapsed = 0
+        self.running = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+
+class Dispatcher:
+    """Runs requests to discord in priority order"""
+
+    def __init__(self):
+        self.queues = [deque() for _ in PRIORITY_NAMES]
+        self.stats = [_ClassStats() for _ in PRIORITY_NAMES]
+        # queued requests that can be combined with later requests for the same target
+        self.keyed: dict = {}
+        self.workers: list[asyncio.Task] = []
+        # set whenever a request may have become available to a waiting worker
+        self.wakeup = asyncio.Event()
+
+    def submit(self, priority: int, func, *args, key=None) -> asyncio.Future:
+        """Queues func(*args) to be run and returns a future for its result.
+        If a key is given and a request with the same key is still queued, that request is replaced by this one and
+        both callers receive the result of this one. A dropped request's future receives None"""
+        queued = self.keyed.get(key) if key is not None else None
+        if queued:
+            queued.func = func
+            queued.args = args
+            self.stats[priority].collapsed += 1
+            return queued.future
+
+        request = _Request(priority, func, args, key)
+        queue = self.queues[priority]
+        queue.append(request)
+        if key is not None:
+            self.keyed[key] = request
+
+        limit = CLASS_LIMITS[priority]
+        if limit is not None and len(queue) > limit:
+            dropped = queue.popleft()
+            self._forget(dropped)
+            dropped.future.set_result(None)
+            self.stats[priority].shed += 1
+
+        self.wakeup.set()
+        return request.future
+
+    async def run(self, priority: int, func, *args, key=None):
+        """Queues func(*args) and waits for its result"""
+        return await self.submit(priority, func, *args, key=key)
+
+    def start(self):
+        """Starts the workers. Requests submitted before this are run once started"""
+        if self.workers:
+            return
+        self.workers = [asyncio.create_task(self._worker(), name=f'dispatch-{i}') for i in range(WORKERS)]
+
+    async def stop(self):
+        """Stops the workers. Requests still queued are cancelled"""
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        for queue in self.queues:
+            while queue:
+                request = queue.popleft()
+                self._forget(request)
+                request.future.cancel()
+
+    def describe(self) -> list[dict]:
+        """Returns the queue depth, wait times and counts for each priority class"""
+        summary = []
+        for name, queue, stats in zip(PRIORITY_NAMES, self.queues, self.stats):
+            finished = stats.completed + stats.failed
+            summary.append({
+                "Name": name,
+                "Queued": len(queue),
+                "Running": stats.running,
+                "Completed": stats.completed,
+                "Failed": stats.failed,
+                "Shed": stats.shed,
+                "Collapsed": stats.collapsed,
+                "Average Wait": stats.total_wait / finished if finished else 0.0,
+                "Max Wait": stats.max_wait,
+                "Oldest Wait": time.monotonic() - queue[0].queued if queue else 0.0
+            })
+        return summary
+
+    def _forget(self, request: _Request):
+        if request.key is not None and self.keyed.get(request.key) is request:
+            del self.keyed[request.key]
+
+    def _next_request(self) -> _Request | None:
+        for priority, queue in enumerate(self.queues):
+            if queue and self.stats[priority].running < CLASS_CONCURRENCY[priority]:
+                request = queue.popleft()
+                self._forget(request)
+                return request
+        return None
+
+    async def _worker(self):
+        while True:
+            request = self._next_request()
+            if request is None:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+
+            stats = self.stats[request.priority]
+            wait = time.monotonic() - request.queued
+            stats.total_wait += wait
+            stats.max_wait = max(stats.max_wait, wait)
+            stats.running += 1
+            try:
+                result = await request.func(*request.args)
+                if not request.future.done():
+                    request.future.set_result(result)
+                stats.completed += 1
+            except asyncio.CancelledError:
+                request.future.cancel()
+                raise
+            except Exception as e:
+                if not request.future.done():
+                    request.future.set_exception(e)
+                stats.failed += 1
+            finally:
+                stats.running -= 1
+                # a class below its concurrency limit may now have requests that can run
+                self.wakeup.set()
+
+
+# the dispatcher used by the bot
+dispatcher = Dispatcher()
@@ -0,0 +1,70 @@
+#### Module for checking emotes are usable as reactions before any requests are made
+import os
+import re
+
+import discord
+from discord import Guild
+
+# custom emotes in the form <:name:id> or <a:name:id>
+CUSTOM_EMOTE = re.compile(r'<a?:[A-Za-z0-9_~]{2,32}:(\d{15,21})>')
+
+# unicode emoji read from emoji.txt the first time they are needed
+_unicode_emoji: frozenset[str] | None = None
+# custom emote id -> guild id, for every custom emote in the guilds the bot is in
+_custom_emotes: dict[int, int] = {}
+# guild id -> ids of its custom emotes
+_guild_emotes: dict[int, set[int]] = {}
+
+
+def unicode_emoji() -> frozenset[str]:
+    """Returns the table of unicode emoji bundled with the bot"""
+    global _unicode_emoji
+    if _unicode_emoji is None:
+        with open(os.path.join(os.path.dirname(__file__), 'emoji.txt'), 'r', encoding='utf-8') as f:
+            _unicode_emoji = frozenset(line.rstrip('\n') for line in f if line.strip() and not line.startswith('# '))
+    return _unicode_emoji
+
+
+def refresh_guild_emotes(guild: Guild, emotes=None):
+    """Updates the custom emotes stored for a guild. Emotes default to the guild's cached emotes"""
+    remove_guild_emotes(guild.id)
+    emote_ids = {emote.id for emote in (guild.emojis if emotes is None else emotes) if emote.available}
+    _guild_emotes[guild.id] = emote_ids
+    for emote_id in emote_ids:
+        _custom_emotes[emote_id] = guild.id
+
+
+def remove_guild_emotes(guild_id: int):
+    """Removes the custom emotes of a guild the bot is no longer in"""
+    for emote_id in _guild_emotes.pop(guild_id, set()):
+        _custom_emotes.pop(emote_id, None)
+
+
+def refresh_all_emotes(client: discord.Client):
+    """Rebuilds the custom emotes for every guild the bot is in"""
+    _custom_emotes.clear()
+    _guild_emotes.clear()
+    for guild in client.guilds:
+        refresh_guild_emotes(guild)
+
+
+def check_emote(emote: str | int) -> str | None:
+    """Checks an emote can be used as a reaction without making any requests.
+    Returns None if it can, or the reason it cannot"""
+    # the older config format stored custom emotes as just their id
+    if isinstance(emote, int) or emote.isdigit():
+        if int(emote) not in _custom_emotes:
+            return f'The emote with id {emote} is not from a server the bot is in'
+        return None
+
+    match = CUSTOM_EMOTE.fullmatch(emote)
+    if match:
+        if int(match.group(1)) not in _custom_emotes:
+            return f'The emote {emote} is not from a server the bot is in'
+        return None
+
+    table = unicode_emoji()
+    # emoji may be typed with or without the variation selector
+    if emote in table or emote + '\ufe0f' in table or emote.replace('\ufe0f', '') in table:
+        return None
+    return f'`{emote}` is not an emote'
@@ -0,0 +1,114 @@
+#### Module for limiting the work done in response to bursts of gateway events
+# Events that lead to a voice channel status update are queued by event type instead of each starting its own task.
+# A fixed number of workers handle the queues. An event for a channel already waiting in a queue is merged with it,
+# as only the channel's latest state matters. A channel is therefore never queued more than once, so the queues are
+# bounded by the number of voice channels and only superseded events are ever discarded
+import asyncio
+import logging
+from collections import deque
+
+from core.util import logger, edit_voice_status
+
+# number of events handled at once
+WORKERS = 4
+
+
+class _TypeStats:
+    __slots__ = ('received', 'merged', 'handled', 'failed')
+
+    def __init__(self):
+        self.received = 0
+        self.merged = 0
+        self.handled = 0
+        self.failed = 0
+
+
+class EventStage:
+    """Bounded stage running handler(channel) for queued channels"""
+
+    def __init__(self, handler):
+        self.handler = handler
+        # event type -> queue of channel ids
+        self.queues: dict[str, deque] = {}
+        self.stats: dict[str, _TypeStats] = {}
+        # channel id -> (event type, channel) for every channel waiting in a queue
+        self.pending: dict[int, tuple] = {}
+        self.workers: list[asyncio.Task] = []
+        self.wakeup = asyncio.Event()
+        # index of the next queue to take from, so one busy event type cannot starve the others
+        self._turn = 0
+
+    def submit(self, event_type: str, channel):
+        """Queues the channel to be handled. Never blocks and never starts a task"""
+        if event_type not in self.queues:
+            self.queues[event_type] = deque()
+            self.stats[event_type] = _TypeStats()
+        stats = self.stats[event_type]
+        stats.received += 1
+
+        # the channel is already waiting, so the waiting entry will see this event's changes too
+        if channel.id in self.pending:
+            queued_type = self.pending[channel.id][0]
+            self.pending[channel.id] = (queued_type, channel)
+            stats.merged += 1
+            return
+
+        self.queues[event_type].append(channel.id)
+        self.pending[channel.id] = (event_type, channel)
+        self.wakeup.set()
+
+    def start(self):
+        """Starts the workers"""
+        if self.workers:
+            return
+        self.workers = [asyncio.create_task(self._worker(), name=f'events-{i}') for i in range(WORKERS)]
+
+    async def stop(self):
+        """Stops the workers. Queued channels are discarded"""
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        for queue in self.queues.values():
+            queue.clear()
+        self.pending.clear()
+
+    def describe(self) -> list[dict]:
+        """Returns the queue depth and counts for each event type"""
+        return [{"Name": event_type,
+                 "Queued": len(self.queues[event_type]),
+                 "Received": stats.received,
+                 "Merged": stats.merged,
+                 "Handled": stats.handled,
+                 "Failed": stats.failed} for event_type, stats in self.stats.items()]
+
+    def _next(self) -> tuple | None:
+        queues = list(self.queues.values())
+        for i in range(len(queues)):
+            queue = queues[(self._turn + i) % len(queues)]
+            if queue:
+                self._turn = (self._turn + i + 1) % len(queues)
+                return self.pending.pop(queue.popleft())
+        return None
+
+    async def _worker(self):
+        while True:
+            entry = self._next()
+            if entry is None:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+
+            event_type, channel = entry
+            try:
+                await self.handler(channel)
+                self.stats[event_type].handled += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats[event_type].failed += 1
+                logger(f'Failed to handle {event_type} for {channel.name}: {e!r}', logging.ERROR, 'events')
+
+
+# the stage used for events that update voice channel statuses
+events = EventStage(edit_voice_status)
@@ -0,0 +1,118 @@
+#### Module for in-memory indexes built from the configs
+# Indexes are rebuilt whenever the config they were built from is replaced (configs are replaced rather than changed
+# in place whenever they are saved or reloaded), so they never need to be cleared by hand
+import bisect
+import itertools
+
+from discord import PartialEmoji, Guild
+
+from core.messages import parse_message_link
+from core.util import get_config
+
+# messagelink -> {emote: role id}. Custom emotes are stored under both their string form and their id
+_reaction_index: dict[str, dict] = {}
+# the "Role Bot" data the reaction index was built from
+_reaction_source: dict | None = None
+# an index loaded from a snapshot, used instead of rebuilding if the config has not changed since
+_restored_index: dict[str, dict] | None = None
+# the "Role Bot" data that was current when the index was restored
+_restored_source: dict | None = None
+
+
+def build_reaction_index(role_bot: dict) -> dict[str, dict]:
+    """Builds the reaction index for the "Role Bot" data in channels.json"""
+    index = {}
+    for messagelink, message_data in role_bot.items():
+        emotes = {}
+        for role in message_data.get("Roles", []):
+            emote = role["Role Emote"]
+            emotes[str(emote)] = role["Role ID"]
+            # custom emotes stored as "<:name:id>" can also be found by their id
+            if isinstance(emote, str) and emote.startswith('<') and emote.endswith('>'):
+                emote_id = emote[:-1].split(':')[-1]
+                if emote_id.isdigit():
+                    emotes[emote_id] = role["Role ID"]
+        index[messagelink] = emotes
+    return index
+
+
+def reaction_index() -> dict[str, dict]:
+    """Returns the reaction index, rebuilding it if channels.json has changed"""
+    global _reaction_index, _reaction_source, _restored_index, _restored_source
+    role_bot = get_config('channels', False)["Role Bot"]
+    if role_bot is not _reaction_source:
+        # the restored index is only used if channels.json has not been saved or reloaded since it was restored
+        if _restored_index is not None and role_bot is _restored_source:
+            _reaction_index = _restored_index
+        else:
+            _reaction_index = build_reaction_index(role_bot)
+        _restored_index = _restored_source = None
+        _reaction_source = role_bot
+    return _reaction_index
+
+
+def find_reaction_role(messagelink: str, emoji: PartialEmoji) -> int | None:
+    """Returns the id of the role given for reacting to a message with an emoji, or None if there is not one"""
+    emotes = reaction_index().get(messagelink)
+    if not emotes:
+        return None
+    role_id = emotes.get(str(emoji))
+    if role_id is None and emoji.is_custom_emoji():
+        role_id = emotes.get(str(emoji.id))
+    return role_id
+
+
+def restore_reaction_index(index: dict[str, dict]):
+    """Uses an index from a snapshot instead of building it. Only valid if channels.json is unchanged since"""
+    global _restored_index, _restored_source, _reaction_source
+    _restored_index = index
+    _restored_source = get_config('channels', False)["Role Bot"]
+    _reaction_source = None
+
+
+# guild id -> (the "Role Bot" data it was built from, sorted (search key, messagelink) pairs)
+_panel_index: dict[int, tuple[dict, list[tuple[str, str]]]] = {}
+
+
+def build_panel_index(guild: Guild, role_bot: dict) -> list[tuple[str, str]]:
+    """Builds the search keys for a guild's reaction role messages. Each message can be found by the name of its
+    channel, its id or its link. Channel names are taken from the guild cache"""
+    keys = []
+    for messagelink in role_bot:
+        try:
+            guild_id, channel_id, message_id = parse_message_link(messagelink)
+        except ValueError:
+            continue
+        if guild_id != guild.id:
+            continue
+        channel = guild.get_channel_or_thread(channel_id)
+        if channel:
+            keys.append((channel.name.lower(), messagelink))
+        keys.append((str(message_id), messagelink))
+        keys.append((messagelink, messagelink))
+    keys.sort()
+    return keys
+
+
+def search_panels(guild: Guild, prefix: str, limit: int = 25) -> list[str]:
+    """Returns up to limit links of the guild's reaction role messages with a channel name, message id or link
+    starting with prefix (ignoring case). Only uses data already in memory"""
+    role_bot = get_config('channels', False)["Role Bot"]
+    source, keys = _panel_index.get(guild.id, (None, []))
+    if source is not role_bot:
+        keys = build_panel_index(guild, role_bot)
+        _panel_index[guild.id] = (role_bot, keys)
+
+    prefix = prefix.strip().lower()
+    found = []
+    for key, messagelink in itertools.islice(keys, bisect.bisect_left(keys, (prefix,)), None):
+        if not key.startswith(prefix) or len(found) == limit:
+            break
+        if messagelink not in found:
+            found.append(messagelink)
+    return found
+
+
+def forget_guild_panels(guild_id: int):
+    """Removes the search keys for a guild the bot is no longer in"""
+    _panel_index.pop(guild_id, None)
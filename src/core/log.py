@@ -0,0 +1,110 @@
+#### Module for the bot's logging pipeline
+# Records are only placed on a queue by the code that logs them. A background thread owned by a QueueListener
+# formats the records and writes them to the console and to size rotated log files, so slow terminals or pipes
+# never hold up the event loop.
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+
+# name of the parent logger, subsystems log under "rolebot.<subsystem>"
+LOG_NAME = 'rolebot'
+# maximum number of records waiting to be written. Records beyond this are dropped rather than blocking
+QUEUE_SIZE = 10000
+
+_queue = queue.Queue(QUEUE_SIZE)
+_listener: logging.handlers.QueueListener | None = None
+# number of records dropped due to the queue being full
+dropped_records = 0
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that never blocks and leaves all formatting to the listener thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # the default implementation formats the message here, which would be on the event loop
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        global dropped_records
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as a single line json object"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record, '%Y-%m-%d %H:%M:%S'),
+            "level": record.levelname,
+            "subsystem": record.name.removeprefix(f'{LOG_NAME}.'),
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+_handler = _DroppingQueueHandler(_queue)
+_root = logging.getLogger(LOG_NAME)
+_root.setLevel(logging.INFO)
+_root.addHandler(_handler)
+_root.propagate = False
+
+
+def get_logger(subsystem: str) -> logging.Logger:
+    """Obtains the logger for a subsystem of the bot. "discord" returns the logger used by discord.py"""
+    if subsystem == 'discord':
+        return logging.getLogger('discord')
+    return logging.getLogger(f'{LOG_NAME}.{subsystem}')
+
+
+def start_logging(settings: dict, directory: str):
+    """Starts the background thread writing log records. Records logged before this is called are kept on the
+    queue and written once it starts.
+     - settings: the data from settings.json
+     - directory: the directory the log files are written to"""
+    global _listener
+    if _listener:
+        return
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter('%(asctime)s \t %(message)s', '%H:%M:%S'))
+
+    logfile = logging.handlers.RotatingFileHandler(f'{directory}/bot.log',
+                                                   maxBytes=settings["Log File Size"],
+                                                   backupCount=settings["Log File Count"],
+                                                   encoding='utf-8')
+    if settings["Log JSON"]:
+        logfile.setFormatter(JsonFormatter())
+    else:
+        logfile.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(name)s: %(message)s'))
+
+    # discord.py logs are passed through the same queue
+    discord_logger = logging.getLogger('discord')
+    if _handler not in discord_logger.handlers:
+        discord_logger.addHandler(_handler)
+    discord_logger.propagate = False
+
+    set_levels(settings["Log Levels"])
+
+    _listener = logging.handlers.QueueListener(_queue, console, logfile, respect_handler_level=True)
+    _listener.start()
+
+
+def set_levels(levels: dict):
+    """Sets the level of each subsystem, e.g. {"bot": "INFO", "discord": "WARNING"}"""
+    for subsystem, level in levels.items():
+        get_logger(subsystem).setLevel(level.upper() if isinstance(level, str) else level)
+
+
+def stop_logging():
+    """Writes any remaining records and stops the background thread"""
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
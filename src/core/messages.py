@@ -0,0 +1,96 @@
+#### Module for resolving message links into channels and messages
+import time
+from collections import OrderedDict
+
+import discord
+from discord import Guild
+
+# how long (in seconds) a fully fetched message is trusted before it is fetched again
+MESSAGE_CACHE_TTL = 300
+# maximum number of fully fetched messages held at once
+MESSAGE_CACHE_SIZE = 128
+# maximum length of a message snippet
+SNIPPET_LENGTH = 40
+
+# message id -> (time fetched, message). Ordered so the oldest entry can be evicted first
+_message_cache: OrderedDict[int, tuple[float, discord.Message]] = OrderedDict()
+# messagelink -> short description of the message, shown when suggesting messages. Kept separately from the message
+# cache so it is not lost whenever the bot's reactions change
+message_snippets: dict[str, str] = {}
+
+
+def parse_message_link(messagelink: str) -> tuple[int, int, int]:
+    """Extracts the guild, channel and message ids as ints from a message link.
+    Raises ValueError if the link is not in the expected format"""
+    parts = messagelink.strip().rstrip('/').split('/')
+    if len(parts) < 3:
+        raise ValueError(f'"{messagelink}" is not a valid message link')
+    guild_id, channel_id, message_id = [int(x) for x in parts[-3:]]
+    return guild_id, channel_id, message_id
+
+
+async def resolve_channel(guild: Guild, channel_id: int):
+    """Obtains a channel from the guild cache, only requesting it from discord if it is not cached"""
+    channel = guild.get_channel_or_thread(channel_id)
+    if channel is None:
+        channel = await guild.fetch_channel(channel_id)
+    return channel
+
+
+async def get_partial_message(guild: Guild, messagelink: str) -> discord.PartialMessage:
+    """Obtains a partial message for the link. No request is made for the message itself, so this should be used
+    whenever only reactions are being added or removed and the contents of the message are not needed"""
+    _, channel_id, message_id = parse_message_link(messagelink)
+    channel = await resolve_channel(guild, channel_id)
+    return channel.get_partial_message(message_id)
+
+
+async def fetch_message(guild: Guild, messagelink: str) -> discord.Message:
+    """Obtains the full message for the link, using a recently fetched copy if one is available.
+    Used for paths that need to inspect the message, such as the bot's current reactions"""
+    _, channel_id, message_id = parse_message_link(messagelink)
+    cached = _message_cache.get(message_id)
+    if cached and time.monotonic() - cached[0] < MESSAGE_CACHE_TTL:
+        _message_cache.move_to_end(message_id)
+        return cached[1]
+
+    channel = await resolve_channel(guild, channel_id)
+    message = await channel.fetch_message(message_id)
+    message_snippets[messagelink] = _snippet(message)
+
+    _message_cache[message_id] = (time.monotonic(), message)
+    _message_cache.move_to_end(message_id)
+    while len(_message_cache) > MESSAGE_CACHE_SIZE:
+        _message_cache.popitem(last=False)
+    return message
+
+
+def forget_message(message_id: int):
+    """Removes a message from the cache. Should be called whenever the bot's own reactions on it change. Other
+    users' reactions do not need to invalidate it, as cached messages are only used to find the bot's reactions"""
+    _message_cache.pop(message_id, None)
+
+
+def _snippet(message: discord.Message) -> str:
+    text = message.content or (message.embeds[0].title or message.embeds[0].description if message.embeds else None)
+    if text:
+        return ' '.join(text.split())[:SNIPPET_LENGTH]
+    # without the message content intent, only the bot's own messages and messages mentioning it have their content
+    # sent, so the author is shown instead
+    return f'message by {message.author.display_name}'
+
+
+def message_snippet(messagelink: str) -> str | None:
+    """Returns a short description of a message that has been fetched before, without making any requests"""
+    return message_snippets.get(messagelink)
+
+
+async def record_snippet(guild: Guild, messagelink: str):
+    """Fetches a newly stored reaction role message so that it has a snippet. Failures are ignored, as the snippet is
+    only used for display"""
+    if messagelink in message_snippets:
+        return
+    try:
+        await fetch_message(guild, messagelink)
+    except (ValueError, discord.HTTPException):
+        pass
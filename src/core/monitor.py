@@ -0,0 +1,113 @@
+#### Module for detecting a blocked event loop and profiling the bot's event handlers
+# A background thread checks that the event loop regularly responds. If it does not respond within the threshold,
+# the stack of the event loop thread is logged, showing the code that is blocking it
+import asyncio
+import cProfile
+import io
+import logging
+import pstats
+import sys
+import threading
+import time
+import traceback
+
+from core.util import logger
+
+# seconds between each check of the event loop
+CHECK_INTERVAL = 0.5
+
+
+class LoopWatchdog:
+    """Measures event loop lag and logs where the loop is stuck when the lag passes the threshold"""
+
+    def __init__(self, threshold: float = 1.0):
+        # seconds the event loop can go without responding before its stack is logged
+        self.threshold = threshold
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.loop_thread_id: int | None = None
+        self.thread: threading.Thread | None = None
+        self.stopping = threading.Event()
+
+        # the most recent and highest lag measured, in seconds
+        self.lag = 0.0
+        self.max_lag = 0.0
+        # number of times the loop was blocked for longer than the threshold
+        self.stalls = 0
+        self._last_beat = 0.0
+
+    def start(self):
+        """Starts the watchdog thread. Must be called from the event loop"""
+        if self.thread:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._run, name='loop-watchdog', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stops the watchdog thread"""
+        if self.thread:
+            self.stopping.set()
+            self.thread.join()
+            self.thread = None
+
+    def _beat(self, sent: float):
+        # runs on the event loop, the delay between sending and running is the lag
+        self.lag = time.monotonic() - sent
+        self.max_lag = max(self.max_lag, self.lag)
+        self._last_beat = time.monotonic()
+
+    def _run(self):
+        reported = False
+        while not self.stopping.wait(CHECK_INTERVAL):
+            try:
+                self.loop.call_soon_threadsafe(self._beat, time.monotonic())
+            except RuntimeError:
+                # the event loop has closed
+                return
+
+            blocked = time.monotonic() - self._last_beat
+            # only one report is made per stall, rather than one every check
+            if blocked > self.threshold + CHECK_INTERVAL and not reported:
+                reported = True
+                self.stalls += 1
+                frame = sys._current_frames().get(self.loop_thread_id)
+                stack = ''.join(traceback.format_stack(frame)) if frame else 'unavailable'
+                logger(f'Event loop has been blocked for {blocked:.2f}s. Currently running:\n{stack}',
+                       logging.WARNING, 'monitor')
+            elif blocked <= self.threshold:
+                reported = False
+
+
+class HandlerProfiler:
+    """Profiles everything run on the event loop for a limited time"""
+
+    def __init__(self):
+        self.running = False
+
+    async def profile(self, seconds: float, limit: int = 15) -> str:
+        """Profiles the event loop for the given number of seconds and returns the functions that took the most time.
+        Raises RuntimeError if a profile is already running"""
+        if self.running:
+            raise RuntimeError('A profile is already running')
+        self.running = True
+        profiler = cProfile.Profile()
+        try:
+            # the profiler records everything run on this thread, which includes every event handler
+            profiler.enable()
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+            self.running = False
+
+        output = io.StringIO()
+        stats = pstats.Stats(profiler, stream=output)
+        stats.strip_dirs().sort_stats(pstats.SortKey.TIME).print_stats(limit)
+        return output.getvalue()
+
+
+# the watchdog and profiler used by the bot
+watchdog = LoopWatchdog()
+profiler = HandlerProfiler()
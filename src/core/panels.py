@@ -0,0 +1,190 @@
+#### Module for importing and exporting reaction role messages ("panels") as json or csv files
+import asyncio
+import csv
+import io
+import json
+
+import discord
+from discord import Guild, HTTPException
+
+from core.dispatch import dispatcher, REACTION
+from core.emojis import check_emote
+from core.messages import parse_message_link, fetch_message, forget_message
+
+# seconds waited between messages when applying reactions, to keep clear of rate limits during large imports
+PANEL_DELAY = 1
+# seconds waited between messages when checking they exist
+CHECK_DELAY = 0.25
+# column names used for csv files
+CSV_COLUMNS = ('messagelink', 'role', 'emote')
+
+
+def read_panels_file(filename: str, data: bytes) -> dict[str, list[dict]]:
+    """Reads an import file into {messagelink: [{"Role": ..., "Role Emote": ...}]}.
+    Accepts the json format produced by export_panels (the same layout as "Role Bot" in channels.json) or a csv file
+    with the columns messagelink, role, emote. Raises ValueError if the file cannot be read"""
+    try:
+        text = data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise ValueError('The file is not valid UTF-8 text')
+
+    panels = {}
+    if filename.lower().endswith('.csv'):
+        reader = csv.DictReader(io.StringIO(text))
+        if not reader.fieldnames or not set(CSV_COLUMNS) <= {name.strip().lower() for name in reader.fieldnames}:
+            raise ValueError(f'The csv file must have the columns: {", ".join(CSV_COLUMNS)}')
+        for row in reader:
+            row = {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+            if not any(row.values()):
+                continue
+            panels.setdefault(row['messagelink'], []).append({"Role": row['role'], "Role Emote": row['emote']})
+        return panels
+
+    try:
+        file_data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f'The json file could not be read: {e}')
+    # an exported channels.json can also be used directly
+    if isinstance(file_data, dict) and isinstance(file_data.get('Role Bot'), dict):
+        file_data = file_data['Role Bot']
+    if not isinstance(file_data, dict):
+        raise ValueError('The json file should contain an object of message links')
+
+    for messagelink, message_data in file_data.items():
+        roles = message_data.get('Roles') if isinstance(message_data, dict) else message_data
+        if not isinstance(roles, list):
+            raise ValueError(f'{messagelink} should contain a list of "Roles"')
+        panels[messagelink] = [{"Role": role.get("Role ID", role.get("Role Name")) if isinstance(role, dict) else None,
+                                "Role Emote": role.get("Role Emote") if isinstance(role, dict) else None}
+                               for role in roles]
+    return panels
+
+
+def validate_panels(guild: Guild, panels: dict[str, list[dict]]) -> tuple[dict, list[str]]:
+    """Checks every message, role and emote in an import before anything is changed.
+    Returns the data to be stored under "Role Bot" and a list of problems found. Nothing should be stored if there
+    are any problems"""
+    role_bot = {}
+    errors = []
+    for messagelink, roles in panels.items():
+        try:
+            guild_id, channel_id, _ = parse_message_link(messagelink)
+        except ValueError:
+            errors.append(f'`{messagelink}` is not a valid message link')
+            continue
+        if guild_id != guild.id:
+            errors.append(f'{messagelink} is not a message in this server')
+            continue
+        if guild.get_channel_or_thread(channel_id) is None:
+            errors.append(f'{messagelink} is in a channel the bot cannot see')
+            continue
+
+        # links are stored in the same form as the ones made from reaction events
+        messagelink = f'https://discord.com/channels/{guild_id}/{channel_id}/{parse_message_link(messagelink)[2]}'
+        stored_roles = []
+        for entry in roles:
+            role = _find_role(guild, entry["Role"])
+            emote = entry["Role Emote"]
+            # custom emote ids are kept as ints, as in the older config format
+            if isinstance(emote, str) and emote.isdigit():
+                emote = int(emote)
+            if role is None:
+                errors.append(f'{messagelink}: role `{entry["Role"]}` was not found')
+            elif role.is_default():
+                errors.append(f'{messagelink}: @everyone cannot be given as a reaction role')
+            elif not emote or not isinstance(emote, (str, int)):
+                errors.append(f'{messagelink}: no emote given for {role.mention}')
+            elif check_emote(emote):
+                errors.append(f'{messagelink}: {check_emote(emote)}')
+            elif any(r["Role ID"] == role.id for r in stored_roles):
+                errors.append(f'{messagelink}: {role.mention} is listed more than once')
+            elif any(r["Role Emote"] == emote for r in stored_roles):
+                errors.append(f'{messagelink}: {emote} is used for more than one role')
+            else:
+                stored_roles.append({"Role Name": role.name, "Role ID": role.id, "Role Emote": emote})
+        if stored_roles:
+            role_bot[messagelink] = {"Roles": stored_roles}
+    return role_bot, errors
+
+
+async def find_missing_messages(guild: Guild, role_bot: dict) -> list[str]:
+    """Checks that every message in an import exists and can be read, pausing briefly between each.
+    Returns a problem for each message that does not. Fetched messages are cached for applying reactions afterwards"""
+    errors = []
+    for messagelink in role_bot:
+        try:
+            await fetch_message(guild, messagelink)
+        except discord.NotFound:
+            errors.append(f'{messagelink} was not found')
+        except HTTPException as e:
+            errors.append(f'{messagelink} could not be read: {e.text or e}')
+        await asyncio.sleep(CHECK_DELAY)
+    return errors
+
+
+def _find_role(guild: Guild, role: str | int | None) -> discord.Role | None:
+    """Finds a role from an id, a mention or a name"""
+    if role is None:
+        return None
+    role = str(role).strip()
+    if role.startswith('<@&') and role.endswith('>'):
+        role = role[3:-1]
+    if role.isdigit():
+        return guild.get_role(int(role))
+    return discord.utils.get(guild.roles, name=role)
+
+
+def guild_panel_links(guild_id: int, role_bot: dict) -> list[str]:
+    """Returns the links of all stored reaction role messages in a guild"""
+    links = []
+    for messagelink in role_bot:
+        try:
+            if parse_message_link(messagelink)[0] == guild_id:
+                links.append(messagelink)
+        except ValueError:
+            continue
+    return links
+
+
+def export_panels(guild_id: int, role_bot: dict, file_format: str) -> bytes:
+    """Creates an export file of all reaction role messages in a guild, in either json or csv format"""
+    panels = {messagelink: role_bot[messagelink] for messagelink in guild_panel_links(guild_id, role_bot)}
+
+    if file_format == 'csv':
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(CSV_COLUMNS)
+        for messagelink, message_data in panels.items():
+            for role in message_data["Roles"]:
+                writer.writerow((messagelink, role["Role ID"], role["Role Emote"]))
+        return output.getvalue().encode('utf-8')
+    return json.dumps(panels, indent=4, ensure_ascii=False).encode('utf-8')
+
+
+async def apply_panel_reactions(client: discord.Client, guild: Guild, role_bot: dict) -> dict:
+    """Makes the bot's reactions on each message match its stored roles. Reactions from other users are left alone.
+    Messages are handled one at a time with a short pause between each.
+    Returns a summary of the reactions added and removed and any messages that failed"""
+    summary = {"Added": 0, "Removed": 0, "Failed": []}
+    for messagelink, message_data in role_bot.items():
+        try:
+            message = await fetch_message(guild, messagelink)
+            wanted = [role["Role Emote"] for role in message_data["Roles"]]
+            for reaction in message.reactions:
+                if reaction.me and str(reaction.emoji) not in wanted and \
+                        getattr(reaction.emoji, 'id', None) not in wanted:
+                    await dispatcher.run(REACTION, message.remove_reaction, reaction, client.user)
+                    summary["Removed"] += 1
+
+            present = {str(reaction.emoji) for reaction in message.reactions if reaction.me}
+            for emote in wanted:
+                if isinstance(emote, int):
+                    emote = client.get_emoji(emote)
+                if str(emote) not in present:
+                    await dispatcher.run(REACTION, message.add_reaction, emote)
+                    summary["Added"] += 1
+        except (HTTPException, TypeError) as e:
+            summary["Failed"].append(f'{messagelink}: {getattr(e, "text", None) or e}')
+        forget_message(parse_message_link(messagelink)[2])
+        await asyncio.sleep(PANEL_DELAY)
+    return summary
@@ -0,0 +1,161 @@
+#### Module for running the bot's background jobs
+import asyncio
+import inspect
+import logging
+import random
+import time
+from datetime import datetime
+
+from core.util import logger
+
+
+class Job:
+    """A function run by the scheduler, either once or every interval seconds"""
+
+    def __init__(self, name: str, func, args: tuple, interval: float | None, delay: float, jitter: float):
+        self.name = name
+        self.func = func
+        self.args = args
+        # None for jobs that only run once
+        self.interval = interval
+        # seconds before the first run
+        self.delay = delay
+        # up to this many seconds are randomly added to each run so jobs do not all run at the same moment
+        self.jitter = jitter
+
+        self.task: asyncio.Task | None = None
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        # runs that were skipped because the job was still running or the bot fell behind schedule
+        self.skipped = 0
+        self.last_run: datetime | None = None
+        self.last_duration: float | None = None
+
+    def describe(self) -> dict:
+        """Returns a summary of the job, used for displaying its state"""
+        return {
+            "Name": self.name,
+            "Interval": self.interval,
+            "Running": self.running,
+            "Runs": self.runs,
+            "Failures": self.failures,
+            "Skipped": self.skipped,
+            "Last Run": self.last_run.strftime("%Y-%m-%d %H:%M:%S") if self.last_run else None,
+            "Last Duration": self.last_duration
+        }
+
+
+class Scheduler:
+    """Runs periodic and one-shot jobs on the event loop.
+     - A job never runs more than once at a time
+     - Runs missed while the loop was busy are combined into a single run rather than run back to back
+     - All jobs are cancelled by stop()"""
+
+    def __init__(self):
+        self.jobs: dict[str, Job] = {}
+        self.started = False
+
+    def add_job(self, name: str, func, *args, interval: float | None = None, delay: float = 0,
+                jitter: float = 0) -> Job:
+        """Adds a job. If the scheduler has already started, the job starts immediately.
+        A job with the same name as an existing job replaces it"""
+        if name in self.jobs:
+            self.cancel_job(name)
+        job = Job(name, func, args, interval, delay, jitter)
+        self.jobs[name] = job
+        if self.started:
+            job.task = asyncio.create_task(self._job_loop(job), name=f'job-{name}')
+        return job
+
+    def cancel_job(self, name: str):
+        """Stops a job from running again and removes it"""
+        job = self.jobs.pop(name, None)
+        if job and job.task:
+            job.task.cancel()
+
+    def start(self):
+        """Starts all jobs. Calling this more than once has no effect"""
+        if self.started:
+            return
+        self.started = True
+        for job in self.jobs.values():
+            # one-shot jobs that have already run are kept only so they can be inspected
+            if job.interval is None and job.last_run:
+                continue
+            job.task = asyncio.create_task(self._job_loop(job), name=f'job-{job.name}')
+
+    async def stop(self):
+        """Cancels all jobs and waits for them to finish"""
+        self.started = False
+        tasks = [job.task for job in self.jobs.values() if job.task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for job in self.jobs.values():
+            job.task = None
+
+    def restore_last_runs(self, last_runs: dict[str, float]):
+        """Delays the first run of each periodic job until one interval after it last ran, e.g. before a restart.
+         - last_runs: job name -> timestamp of its last run"""
+        now = datetime.now().timestamp()
+        for name, last_run in last_runs.items():
+            job = self.jobs.get(name)
+            if job and job.interval is not None:
+                job.delay = max(job.delay, last_run + job.interval - now)
+
+    def last_runs(self) -> dict[str, float]:
+        """Returns the timestamp of each job's last run"""
+        return {job.name: job.last_run.timestamp() for job in self.jobs.values() if job.last_run}
+
+    async def run_now(self, name: str) -> bool:
+        """Runs a job immediately. Returns False if the job was already running"""
+        return await self._run(self.jobs[name])
+
+    def describe(self) -> list[dict]:
+        """Returns a summary of every job"""
+        return [job.describe() for job in self.jobs.values()]
+
+    async def _job_loop(self, job: Job):
+        due = time.monotonic() + job.delay
+        while True:
+            await asyncio.sleep(max(0.0, due + random.uniform(0, job.jitter) - time.monotonic()))
+            await self._run(job)
+            if job.interval is None:
+                break
+
+            due += job.interval
+            now = time.monotonic()
+            # if runs were missed (e.g. the loop was blocked), they are combined into a single run straight away
+            if due < now:
+                job.skipped += int((now - due) // job.interval)
+                due = now
+
+        job.task = None
+
+    async def _run(self, job: Job) -> bool:
+        if job.running:
+            job.skipped += 1
+            return False
+
+        job.running = True
+        job.last_run = datetime.now()
+        start = time.perf_counter()
+        try:
+            result = job.func(*job.args)
+            if inspect.isawaitable(result):
+                await result
+            job.runs += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job.failures += 1
+            logger(f'Job "{job.name}" failed: {e!r}', logging.ERROR, 'scheduler')
+        finally:
+            job.last_duration = time.perf_counter() - start
+            job.running = False
+        return True
+
+
+# the scheduler used by the bot
+scheduler = Scheduler()
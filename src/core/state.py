@@ -0,0 +1,83 @@
+#### Module for saving the bot's runtime state on shutdown so it can start warm after a restart
+# The snapshot holds things that are slow or costly to work out again, such as the reaction index. It is only used
+# if it was made by the same version of the bot, is recent, and (for anything built from the configs) the configs have
+# not changed since. Voice channel statuses are not kept, as discord clears them when a channel empties, which may
+# have happened while the bot was offline
+import gzip
+import json
+import logging
+import os
+import time
+
+import core.core as core
+import core.util as util
+from core.index import reaction_index, restore_reaction_index
+from core.messages import message_snippets
+from core.scheduler import scheduler
+from core.update import __VERSION__
+
+# snapshots older than this (in seconds) are ignored
+MAX_AGE = 86400
+# jobs whose schedule is carried over, so that a restart does not make them all run at once
+RESTORED_JOBS = ('Reaction Reconcile', 'Stats Snapshot', 'Config Compaction')
+
+
+def _state_path() -> str:
+    return f'{core.PATH}/config/state.json.gz'
+
+
+def save_state():
+    """Writes the snapshot. Should be called after pending config changes have been flushed"""
+    state = {
+        "Version": __VERSION__,
+        "Saved": time.time(),
+        "Config Signature": util.config_signature('channels'),
+        "Reaction Index": reaction_index(),
+        "Reconcile Checkpoints": util.reconcile_checkpoints,
+        # only snippets of messages that are still stored are kept
+        "Message Snippets": {messagelink: snippet for messagelink, snippet in message_snippets.items()
+                             if messagelink in util.get_config('channels', False)["Role Bot"]},
+        "Job Last Runs": scheduler.last_runs()
+    }
+    path = _state_path()
+    with gzip.open(path + '.tmp', 'wt', encoding='utf-8') as f:
+        json.dump(state, f, separators=(',', ':'))
+    os.replace(path + '.tmp', path)
+    util.logger(f'Saved state snapshot ({os.path.getsize(path)} bytes)', subsystem='state')
+
+
+def load_state() -> bool:
+    """Loads the snapshot if there is a valid one. Must be called after the scheduler's jobs have been added but
+    before it starts. Returns whether a snapshot was used"""
+    path = _state_path()
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return False
+    except (OSError, EOFError, json.JSONDecodeError) as e:
+        util.logger(f'Could not read the state snapshot, starting cold: {e}', logging.WARNING, 'state')
+        return False
+    finally:
+        # a snapshot is only used once, so an old one is never loaded after a crash
+        if os.path.isfile(path):
+            os.remove(path)
+
+    if state.get("Version") != __VERSION__ or time.time() - state.get("Saved", 0) > MAX_AGE:
+        util.logger('State snapshot is out of date, starting cold', subsystem='state')
+        return False
+
+    # snippets are only for display, so they are kept even if the configs have changed
+    message_snippets.update(state.get("Message Snippets", {}))
+    scheduler.restore_last_runs({name: last_run for name, last_run in state["Job Last Runs"].items()
+                                 if name in RESTORED_JOBS})
+
+    # anything built from channels.json is only valid if it has not been edited since
+    if state["Config Signature"] != util.config_signature('channels'):
+        util.logger('Loaded state snapshot: channels.json has changed, so the reaction index will be rebuilt',
+                    subsystem='state')
+        return True
+    restore_reaction_index(state["Reaction Index"])
+    util.reconcile_checkpoints.update(state["Reconcile Checkpoints"])
+    util.logger(f'Loaded state snapshot: {len(state["Reaction Index"])} indexed messages', subsystem='state')
+    return True
@@ -1,5 +1,7 @@
 import asyncio
+import logging
 import os
+from functools import partial
 
 import discord
 import requests
@@ -10,12 +12,13 @@ __VERSION__ = "1.1.2"
 
 import core.core as core
 from core.util import logger
+from core.dispatch import dispatcher, VOICE_STATUS
 
 
 def check_version() -> str | None:
     """Function for checking on github for the most recent version of the discord bot
     Returns string of latest github version, or None if not available"""
-    logger('Checking for updates...', end='')
+    logger('Checking for updates...', subsystem='update')
     src_url = 'https://github.com/KDWallace/DiscordRoleBot/blob/main/src/core/update.py'
     r = requests.get(src_url)
 
@@ -25,10 +28,11 @@ def check_version() -> str | None:
         if "__VERSION__ = " in text:
             git_version = text.split('__VERSION__ = ')[1].replace('\\', '').split('"')[1]
             if git_version == __VERSION__:
-                print(f"Up to date (Latest version: {git_version})")
+                logger(f"Up to date (Latest version: {git_version})", subsystem='update')
             else:
-                print(f"An update is available (Current version: {__VERSION__}, Latest Github Version: {git_version})")
-                logger(f"Downloading update to: \"{core.PATH}version {git_version}\"...", end='')
+                logger(f"An update is available (Current version: {__VERSION__}, Latest Github Version: {git_version})",
+                       logging.WARNING, 'update')
+                logger(f"Downloading update to: \"{core.PATH}version {git_version}\"...", subsystem='update')
                 update_from_github(git_version)
             return git_version
 
@@ -76,27 +80,30 @@ def update_from_github(version: str | None):
                             os.rename(filename, filename + '.old')
                         with open(filename, "wb") as f:
                             f.write(file_content.decoded_content)
-                print('Download complete')
+                logger('Download complete', subsystem='update')
             else:
-                print(f'Update already downloaded.\nPlease use the package found in:\n\t{directory}')
+                logger(f'Update already downloaded. Please use the package found in: {directory}', subsystem='update')
 
         else:
-            print('Was unable to find: https://github.com/KDWallace/DiscordRoleBot/')
+            logger('Was unable to find: https://github.com/KDWallace/DiscordRoleBot/', logging.ERROR, 'update')
 
 
 async def update_routine(client):
-    while True:
-        git_version = check_version()
-        if git_version != __VERSION__:
-            await client.change_presence(status=discord.Status.dnd,
-                                         activity=discord.Activity(type=discord.ActivityType.custom,
-                                                                   name="custom",
-                                                                   state=f"Outdated. V{git_version} is available"))
-
-        else:
-            await client.change_presence(status=discord.Status.online,
-                                         activity=discord.Activity(type=discord.ActivityType.custom,
-                                                                   name="custom",
-                                                                   state=f"Current version: V{__VERSION__}"))
-        # sleep for a day
-        await asyncio.sleep(86400)
+    """Checks for updates and shows the result in the bot's status. Run once a day by the scheduler"""
+    # the first run is scheduled before the bot connects, and the presence cannot be changed until it has
+    await client.wait_until_ready()
+    # the check makes blocking web requests, so it is run outside the event loop
+    git_version = await asyncio.to_thread(check_version)
+    if git_version != __VERSION__:
+        presence = partial(client.change_presence, status=discord.Status.dnd,
+                           activity=discord.Activity(type=discord.ActivityType.custom,
+                                                     name="custom",
+                                                     state=f"Outdated. V{git_version} is available"))
+
+    else:
+        presence = partial(client.change_presence, status=discord.Status.online,
+                           activity=discord.Activity(type=discord.ActivityType.custom,
+                                                     name="custom",
+                                                     state=f"Current version: V{__VERSION__}"))
+    # the status is cosmetic, so it waits behind anything users are waiting on
+    await dispatcher.run(VOICE_STATUS, presence, key='Presence')
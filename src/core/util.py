@@ -1,13 +1,33 @@
+import asyncio
 import json
+import logging
 import math
 import os
 import random
-from datetime import datetime
+import time
+from copy import deepcopy
 
 import discord
-from discord import Member, VoiceChannel
+from discord import Member, VoiceChannel, HTTPException
 
 import core.core as core
+from core.log import get_logger
+from core.dispatch import dispatcher, REACTION, VOICE_STATUS
+from core.messages import parse_message_link, fetch_message, forget_message
+
+# config data held in memory, keyed by filename
+_configs: dict[str, dict] = {}
+# modification time of each config file when it was last read or written by the bot
+_config_mtimes: dict[str, float] = {}
+# configs that have been changed in memory but not yet written to disk
+_dirty_configs: set[str] = set()
+
+# the status last applied to each voice channel, used to skip edits that would change nothing
+voice_statuses: dict[int, str] = {}
+# the status of each voice channel's edit still waiting in the dispatcher
+_requested_statuses: dict[int, str] = {}
+# time each reaction role message was last checked by reconcile_reactions
+reconcile_checkpoints: dict[str, float] = {}
 
 
 def approved_role_user(interaction: discord.Interaction) -> bool:
@@ -23,7 +43,7 @@ def approved_channel_user(interaction: discord.Interaction) -> bool:
 def check_approved_user(interaction: discord.Interaction, user_check_type: str) -> bool:
     """Returns whether the user has permission to use the command"""
     filename = f'configs-{interaction.guild_id}'
-    data = get_config(filename)
+    data = get_config(filename, False)
 
     # if both fields are empty, return true
     if not data[f'{user_check_type} Handles'] and not data[f'{user_check_type} Roles']:
@@ -41,13 +61,87 @@ def check_approved_user(interaction: discord.Interaction, user_check_type: str)
     return interaction.user.guild_permissions.administrator
 
 
-def get_config(filename: str) -> dict:
-    """Obtains config file. Will generate missing files if none are present"""
-    if os.path.isfile(f'{core.PATH}/config/{filename}.json'):
-        with open(f'{core.PATH}/config/{filename}.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
-    else:
-        return check_config_integrity(filename)
+def get_config(filename: str, copy: bool = True) -> dict:
+    """Obtains config file. Will generate missing files if none are present.
+    Returns a copy that can be freely changed. If copy is False, the data held in memory is returned instead, which is
+    faster but must not be modified.
+    Files are only read the first time they are needed, edits made outside the bot are picked up by core.watcher"""
+    data = _configs.get(filename)
+    if data is None:
+        if os.path.isfile(f'{core.PATH}/config/{filename}.json'):
+            data = _read_config(filename)
+        else:
+            data = check_config_integrity(filename)
+    return deepcopy(data) if copy else data
+
+
+def _config_mtime(filename: str) -> float | None:
+    """Returns the modification time of a config file, or None if it does not exist"""
+    try:
+        return os.stat(f'{core.PATH}/config/{filename}.json').st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def config_signature(filename: str) -> list | None:
+    """Returns the modification time and size of a config file, used to tell if it has changed between runs"""
+    try:
+        stat = os.stat(f'{core.PATH}/config/{filename}.json')
+    except FileNotFoundError:
+        return None
+    return [stat.st_mtime, stat.st_size]
+
+
+def loaded_configs() -> list[str]:
+    """Returns the names of all configs held in memory"""
+    return list(_configs)
+
+
+def config_changed(filename: str) -> bool:
+    """Returns whether a config file has been changed outside the bot since it was last read or written"""
+    return filename in _configs and _config_mtime(filename) != _config_mtimes.get(filename)
+
+
+def reload_config(filename: str) -> bool:
+    """Reads a config file again after it has been changed outside the bot.
+    Returns False if the file could not be read, in which case the data already in memory is kept"""
+    if filename in _dirty_configs:
+        logger(f'{filename}.json was edited while the bot had unsaved changes to it. The unsaved changes are discarded',
+               logging.WARNING, 'config')
+        _dirty_configs.discard(filename)
+    try:
+        _read_config(filename)
+    except FileNotFoundError:
+        logger(f'{filename}.json was deleted. It will be written again from memory', logging.WARNING, 'config')
+        _dirty_configs.add(filename)
+        return False
+    except (OSError, json.JSONDecodeError) as e:
+        logger(f'Could not reload {filename}.json, keeping the previous settings: {e}', logging.ERROR, 'config')
+        # stops the same broken file being reported again until it is next changed
+        _config_mtimes[filename] = _config_mtime(filename)
+        return False
+    logger(f'Reloaded {filename}.json', subsystem='config')
+    return True
+
+
+def _read_config(filename: str) -> dict:
+    """Reads a config file from disk into memory"""
+    with open(f'{core.PATH}/config/{filename}.json', 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    _configs[filename] = data
+    _config_mtimes[filename] = _config_mtime(filename)
+    return data
+
+
+def _write_config(filename: str, data: dict):
+    """Writes a config file to disk. A temporary file is used so the config is never left half written"""
+    path = f'{core.PATH}/config/{filename}.json'
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=4)
+    os.replace(path + '.tmp', path)
+    _configs[filename] = data
+    _config_mtimes[filename] = _config_mtime(filename)
+    _dirty_configs.discard(filename)
 
 
 def get_config_variable(data: dict, entry: str, filename: str, servername: str = None):
@@ -68,7 +162,8 @@ def check_config_entry(data: dict, entries: str | tuple | list, filename: str, s
     # iterate through list, upon a single missing entry, generate all missing data
     for entry in entries:
         if entry not in data:
-            logger(f'Missing entry "{entry}" in {filename}.json. Adding missing entries to the file')
+            logger(f'Missing entry "{entry}" in {filename}.json. Adding missing entries to the file',
+                   logging.WARNING, 'config')
             return check_config_integrity(filename, servername, entry)
     return data
 
@@ -98,16 +193,31 @@ def check_config_integrity(filename: str, servername: str = None, entry: str = N
     elif filename == 'channels':
         filedata = {"Channels": {}, "Role Bot": {}}
 
+    # default settings.json data, used for settings that apply to the bot as a whole
+    elif filename == 'settings':
+        filedata = {
+            "Log Levels": {"bot": "INFO", "core": "INFO", "config": "INFO", "update": "INFO", "discord": "WARNING"},
+            "Log JSON": False,
+            "Log File Size": 1048576, "Log File Count": 5,
+            # seconds between each run of the background jobs
+            "Job Intervals": {"Update Check": 86400, "Config Flush": 10, "Reaction Reconcile": 21600,
+                              "Stats Snapshot": 3600, "Config Compaction": 86400},
+            # seconds the event loop can be blocked for before the code blocking it is logged
+            "Loop Lag Threshold": 1.0
+        }
+
     # otherwise, ignore
     else:
         raise FileNotFoundError(f'The file "{filename}" is not a recognised type')
 
-    # if the file exists
-    if os.path.isfile(f'{core.PATH}/config/{filename}.json'):
+    # if the file exists (or has changes waiting to be written)
+    if filename in _dirty_configs or os.path.isfile(f'{core.PATH}/config/{filename}.json'):
 
-        # read the file and check for missing entries. If any present then change = True
-        with open(f'{core.PATH}/config/{filename}.json', 'r', encoding='UTF-8') as f:
-            old_data = json.load(f)
+        # check for missing entries, reading the file only if it is not already in memory or has been changed outside
+        # the bot. Replacing data already in memory would make anything built from it look out of date.
+        # If any entries are missing then change = True
+        in_memory = filename in _dirty_configs or (filename in _configs and not config_changed(filename))
+        old_data = _configs[filename] if in_memory else _read_config(filename)
 
         change = False
         for entry in filedata:
@@ -122,8 +232,7 @@ def check_config_integrity(filename: str, servername: str = None, entry: str = N
 
     # if changes have been made, overwrite the file with the modified data
     if change:
-        with open(f'{core.PATH}/config/{filename}.json', 'w') as f:
-            json.dump(old_data, f, indent=4)
+        _write_config(filename, old_data)
 
     if entry and entry not in old_data:
         raise IndexError(f'Requested entry "{entry}" not present in config type: {filename}.json')
@@ -132,14 +241,38 @@ def check_config_integrity(filename: str, servername: str = None, entry: str = N
 
 
 def save_config(filename: str, data: dict):
-    """Saves to json config file"""
-    with open(f'{core.PATH}/config/{filename}.json', 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4)
+    """Saves config data. The data is used immediately, but is only written to the json file by flush_configs()"""
+    _configs[filename] = data
+    _dirty_configs.add(filename)
+
+
+def flush_configs():
+    """Writes all configs with unsaved changes to their json files"""
+    for filename in list(_dirty_configs):
+        _write_config(filename, _configs[filename])
+
+
+def delete_config(filename: str) -> int:
+    """Deletes a config file and removes it from memory. Returns the number of bytes the file used"""
+    _configs.pop(filename, None)
+    _config_mtimes.pop(filename, None)
+    _dirty_configs.discard(filename)
+    try:
+        size = os.path.getsize(f'{core.PATH}/config/{filename}.json')
+        os.remove(f'{core.PATH}/config/{filename}.json')
+    except FileNotFoundError:
+        return 0
+    return size
+
+
+def config_size(filename: str) -> int:
+    """Returns the number of bytes a config uses when written to its json file"""
+    return len(json.dumps(get_config(filename, False), indent=4).encode('utf-8'))
 
 
 def get_valid_roles(member: Member) -> list:
     """Obtains list of all role names recognised in the config file"""
-    config_roles = get_config(f'configs-{member.guild.id}')
+    config_roles = get_config(f'configs-{member.guild.id}', False)
 
     # obtain lists
     white_list = config_roles["White List"]
@@ -172,8 +305,8 @@ async def edit_voice_status(channel: VoiceChannel):
 
     filename = f'configs-{channel.guild.id}'
 
-    channel_data = get_config('channels')
-    config_data = get_config(filename)
+    channel_data = get_config('channels', False)
+    config_data = get_config(filename, False)
 
     # get valid channel ids
     config_channels = get_config_variable(channel_data, 'Channels', 'channels')
@@ -208,6 +341,8 @@ async def edit_voice_status(channel: VoiceChannel):
             role = random.choice(random_roles)
 
     else:
+        # discord clears the status of an empty channel, so the recorded status can no longer be trusted
+        voice_statuses.pop(channel.id, None)
         return
 
     # gets percent of users with this role
@@ -229,8 +364,80 @@ async def edit_voice_status(channel: VoiceChannel):
 
     return_string += f' {percent}% {role}'
 
-    await channel.edit(status=return_string)
-
+    # no request is made if the channel is already showing this status, or will be once a queued edit runs.
+    # Otherwise a queued edit to another status would run after this one was skipped
+    if _requested_statuses.get(channel.id, voice_statuses.get(channel.id)) == return_string:
+        return
+    _requested_statuses[channel.id] = return_string
+    try:
+        # queued edits for the same channel are combined, as only the latest status matters
+        await dispatcher.run(VOICE_STATUS, _apply_voice_status, channel, return_string,
+                             key=('Voice Status', channel.id))
+    finally:
+        # once finished, failed or dropped, the applied status is used again, unless a later edit has been requested
+        if _requested_statuses.get(channel.id) == return_string:
+            del _requested_statuses[channel.id]
+
+
+async def _apply_voice_status(channel: VoiceChannel, status: str):
+    await channel.edit(status=status)
+    voice_statuses[channel.id] = status
+
+
+def _current_roles(messagelink: str) -> list:
+    message_data = get_config('channels', False)["Role Bot"].get(messagelink)
+    return message_data["Roles"] if message_data else []
+
+
+async def reconcile_reactions(client: discord.Client):
+    """Adds back any of the bot's reactions missing from stored reaction role messages, e.g. ones removed by a
+    moderator while the bot was offline. Messages are checked one at a time to spread out the requests"""
+    # messages checked recently (e.g. just before a restart) are skipped
+    recent = time.time() - get_config('settings', False)["Job Intervals"]["Reaction Reconcile"] / 2
+    added = 0
+    for messagelink in list(get_config('channels', False)["Role Bot"]):
+        # messages removed since the run started are skipped
+        if reconcile_checkpoints.get(messagelink, 0) > recent or not _current_roles(messagelink):
+            continue
+        try:
+            guild = client.get_guild(parse_message_link(messagelink)[0])
+            if guild is None:
+                continue
+            message = await fetch_message(guild, messagelink)
+        except (ValueError, HTTPException):
+            continue
 
-def logger(message: str, end: str = '\n'):
-    print(datetime.now().strftime("%H:%M:%S"), '\t', message, end=end)
+        # reactions the bot has already made, both as strings and as ids for the old id format
+        present = set()
+        for reaction in message.reactions:
+            if reaction.me:
+                present.add(str(reaction.emoji))
+                if reaction.is_custom_emoji():
+                    present.add(reaction.emoji.id)
+
+        # the configs may have been saved while waiting, so the current roles are checked before each reaction
+        # rather than those from when the run started
+        for role in _current_roles(messagelink):
+            emote = role["Role Emote"]
+            if emote in present or role not in _current_roles(messagelink):
+                continue
+            if isinstance(emote, int):
+                emote = client.get_emoji(emote)
+                if emote is None:
+                    continue
+            try:
+                await dispatcher.run(REACTION, message.add_reaction, emote)
+                forget_message(message.id)
+                added += 1
+            except HTTPException:
+                pass
+        reconcile_checkpoints[messagelink] = time.time()
+        await asyncio.sleep(1)
+
+    if added:
+        logger(f'Reconciled reaction role messages: {added} missing reactions added', subsystem='config')
+
+
+def logger(message: str, level: int = logging.INFO, subsystem: str = 'bot'):
+    """Logs a message for the given subsystem. The message is only queued here and is written in the background"""
+    get_logger(subsystem).log(level, message)
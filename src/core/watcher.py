@@ -0,0 +1,125 @@
+#### Module for reloading config files edited while the bot is running
+# Uses the watchdog library (inotify on linux) if it is installed, otherwise the config files are checked for
+# changes by a scheduler job
+import asyncio
+import os
+
+import discord
+
+import core.core as core
+from core.scheduler import scheduler
+from core.util import logger, get_config, loaded_configs, config_changed, reload_config, edit_voice_status
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+
+# seconds between checks for changed files when watchdog is not installed
+POLL_INTERVAL = 2
+# seconds to wait for further changes before reloading, as editors often write a file more than once when saving
+SETTLE_TIME = 0.5
+# maximum number of voice channels having their status updated at once after a reload
+VOICE_REFRESH_CONCURRENCY = 3
+
+_observer = None
+# configs changed since the last reload
+_pending: set[str] = set()
+_pending_handle: asyncio.TimerHandle | None = None
+
+
+if Observer:
+    class _ConfigEventHandler(FileSystemEventHandler):
+        """Passes changes to config files from the watchdog thread to the event loop"""
+
+        def __init__(self, client: discord.Client, loop: asyncio.AbstractEventLoop):
+            self.client = client
+            self.loop = loop
+
+        def on_any_event(self, event):
+            # files saved by replacing them (as the bot and many editors do) arrive as moved events
+            for path in (event.src_path, getattr(event, 'dest_path', '')):
+                if path and path.endswith('.json'):
+                    filename = os.path.basename(path)[:-5]
+                    self.loop.call_soon_threadsafe(_queue_reload, self.client, filename)
+
+
+def start_config_watcher(client: discord.Client):
+    """Starts watching the config directory for changes"""
+    global _observer
+    if Observer:
+        if _observer:
+            return
+        _observer = Observer()
+        _observer.schedule(_ConfigEventHandler(client, asyncio.get_running_loop()), f'{core.PATH}/config')
+        _observer.daemon = True
+        _observer.start()
+        logger('Watching config files for changes', subsystem='config')
+    else:
+        scheduler.add_job('Config Watch', poll_configs, client, interval=POLL_INTERVAL)
+        logger('watchdog is not installed, config files will be checked for changes every '
+               f'{POLL_INTERVAL} seconds', subsystem='config')
+
+
+def stop_config_watcher():
+    """Stops watching the config directory"""
+    global _observer
+    if _observer:
+        _observer.stop()
+        _observer = None
+    scheduler.cancel_job('Config Watch')
+
+
+async def poll_configs(client: discord.Client):
+    """Reloads any config files that have changed. Used when watchdog is not installed"""
+    for filename in loaded_configs():
+        if config_changed(filename):
+            await _reload(client, filename)
+
+
+def _queue_reload(client: discord.Client, filename: str):
+    global _pending_handle
+    _pending.add(filename)
+    if _pending_handle:
+        _pending_handle.cancel()
+    _pending_handle = asyncio.get_running_loop().call_later(SETTLE_TIME, _start_reloads, client)
+
+
+def _start_reloads(client: discord.Client):
+    global _pending_handle
+    _pending_handle = None
+    filenames = list(_pending)
+    _pending.clear()
+    for filename in filenames:
+        # changes written by the bot itself are ignored here
+        if config_changed(filename):
+            asyncio.create_task(_reload(client, filename))
+
+
+async def _reload(client: discord.Client, filename: str):
+    if reload_config(filename) and filename.startswith('configs-'):
+        await refresh_guild_voice(client, int(filename.removeprefix('configs-')))
+
+
+async def refresh_guild_voice(client: discord.Client, guild_id: int):
+    """Updates the status of every occupied voice channel the bot manages in a single guild"""
+    guild = client.get_guild(guild_id)
+    if guild is None:
+        return
+
+    channel_ids = set(get_config('channels', False)["Channels"].values())
+    icon = get_config(f'configs-{guild_id}', False)["Active Icon"]
+    channels = [channel for channel in guild.voice_channels
+                if channel.members and (channel.id in channel_ids or channel.name.endswith(icon))]
+
+    semaphore = asyncio.Semaphore(VOICE_REFRESH_CONCURRENCY)
+
+    async def refresh(channel):
+        async with semaphore:
+            try:
+                await edit_voice_status(channel)
+            except discord.HTTPException as e:
+                logger(f'Could not update the status of {channel.name}: {e}', subsystem='config')
+
+    await asyncio.gather(*(refresh(channel) for channel in channels))